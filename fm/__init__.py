@@ -21,5 +21,8 @@
 from __future__ import absolute_import
 
 from fm.dnf_base import DnfBase
+from fm.modules_catalog import ModulesCatalog
 
 dnfbase = DnfBase()
+#: Module metadata catalog shared by all the commands in this process.
+catalog = ModulesCatalog()
@@ -25,12 +25,19 @@ Command line interface fm class and related functions.
 from __future__ import absolute_import
 from __future__ import print_function
 
+import itertools
 import json
 import sys
+import time
+
+import dnf.exceptions
 
 import fm.exceptions
 from fm.config_file import ConfigFile, ModuleSection
-from fm.modules import Modules
+from fm.modules import SORT_KEYS, Modules
+from fm.modules_resolver.modules_resolver import FmModulesResolver
+from fm.modules_search import ModulesSearch
+from fm.modules_writer import ModulesWriter
 from fm.option_parser import OptionParser
 
 
@@ -46,11 +53,15 @@ class Cli(object):
 
         #: File to which the output is written.
         self.output = output
+        #: ModulesWriter instance streaming module descriptions to output.
+        self.writer = ModulesWriter(output)
         #: OptionParser instance to handle command line arguments.
         self.optparser = OptionParser()
         #: Options set by command line.
         self.opts = None
         self.config_file = ConfigFile()
+        #: Modules instance shared by the commands run by this Cli.
+        self._modules = None
 
     def write(self, *args):
         if len(args[0]) == 0:
@@ -61,6 +72,7 @@ class Cli(object):
     def parse_args(self, args):
         self.opts, args = self.optparser.parse_known_args(args)
         self.config_file.load()
+        self._modules = None
         return args
 
     def run(self, opts):
@@ -80,17 +92,19 @@ class Cli(object):
                 self.print_help()
                 return 0
             elif subcommand == "list":
-                return self.list_modules()
+                return self.list_modules(opts)
             elif subcommand == "list-installed":
-                return self.list_installed_modules()
+                return self.list_installed_modules(opts)
             elif subcommand == "info":
-                return self.info_modules(arg)
+                return self.info_modules(arg, opts)
             elif subcommand == "install":
+                if getattr(opts, "plan", False):
+                    return self.plan_install(args)
                 return self.install_module(arg)
             elif subcommand == "summary":
                 return self.summary_modules()
             elif subcommand == "search":
-                return self.search_modules(self.opts)
+                return self.search_modules(opts)
             elif subcommand == "refresh":
                 return self.refresh_cache()
             else:
@@ -111,6 +125,10 @@ class Cli(object):
         self.write("    {} help - Show this help message.".format(fn))
         self.write("    {} info <module> - Show detail module information.".format(fn))
         self.write("    {} list - List all available modules.".format(fn))
+        self.write("        {} list --limit <n> --offset <n> - Optional: List only the given page of modules.".format(fn))
+        self.write("        {} list --sort <name|version|summary> - Optional: Sort the modules, prefix with '-' for descending order.".format(fn))
+        self.write("    {} install <module> - Install module's profiles.".format(fn))
+        self.write("        {} install --plan <module>... - Only show the module and package transaction and the time spent in each phase.".format(fn))
         self.write("    {} list-installed - List installed modules.".format(fn))
         self.write("    {} refresh - Refresh the local modules cache".format(fn))
         self.write("    {} search <args> Search for a module using at least one of the following args:".format(fn))
@@ -120,16 +138,48 @@ class Cli(object):
         self.write("        {} search --requires <name> <version> - Optional: Search for module by requires.".format(fn))
         self.write("        {} search --license <license name> - Optional: Search for module by module license.".format(fn))
         self.write("        {} search --json <json text> - Optional: Search using json. (See `--json help` for more details.)".format(fn))
+        self.write("        {} search --rpm <rpm name> - Show which modules ship the RPM.".format(fn))
+        self.write("        {} search --fuzzy <text> - Show modules with name or summary similar to the text.".format(fn))
+        self.write("        {} search --text <text> - Full-text search in module summaries and descriptions.".format(fn))
+        self.write("        {} search ... --limit <n> --offset <n> - Optional: Stop after the given page of matches.".format(fn))
+        self.write("        {} search --whatrequires <name[:stream]> [--recursive] - Show modules requiring the module, with --recursive also indirectly.".format(fn))
+        self.write("        {} search <args> --explain - Show the search plan and timings of each step.".format(fn))
         self.write("    {} summary - Show modules statistics.".format(fn))
         self.write("")
+        self.write("    The info, list, list-installed and search commands accept --format=jsonl")
+        self.write("    to print one JSON object per module instead of the columns output.")
+        self.write("")
         self.write("Options:")
         self.write(self.optparser.get_usage())
 
-    def info_modules(self, module):
+    @staticmethod
+    def is_jsonl(args):
+        """
+        Returns True if the JSON Lines output has been requested.
+        """
+        return getattr(args, "format", None) == "jsonl"
+
+    def write_modules(self, args, mods, full=False):
+        """
+        Writes the modules in the output format requested by `args`.
+
+        :param args: Command line arguments.
+        :param iterable mods: ModuleMetadata instances to write.
+        :param bool full: Write full description instead of the brief one.
+        """
+        if self.is_jsonl(args):
+            self.writer.write_jsonl_modules(mods)
+        elif full:
+            self.writer.write_full_description(mods)
+        else:
+            self.writer.write_brief_description(mods)
+
+    def info_modules(self, module, args=None):
         """
         Handles "info" command. Prints the full information about module.
 
         :param string module: Name of the module.
+        :param args: Command line arguments.
         :return: Error code, 0 on success.
         :rtype: int
         """
@@ -138,7 +188,7 @@ class Cli(object):
             return 1
 
         mods = self.get_modules()
-        self.write(mods.get_full_description(module))
+        self.write_modules(args, mods.get_sorted_modules(module), full=True)
         return 0
 
     def install_module(self, module):
@@ -146,8 +196,7 @@ class Cli(object):
             self.write("No argument")
             return 1
 
-        modules = Modules(self.config_file, self.opts)
-        modules.load_modules()
+        modules = self.get_modules()
         module_metadata = modules.get_modules(module)
 
         if module_metadata is None:
@@ -164,6 +213,111 @@ class Cli(object):
                                 installed)
         self.config_file.update_module(section)
 
+    def plan_install(self, specs):
+        """
+        Handles "install --plan" command. Resolves the modules and their
+        default profiles' packages like the installation would, prints both
+        transactions and the time spent in each phase, but changes nothing.
+
+        :param list specs: Modules to install, "name[:stream[:version]]".
+        :return: Error code, 0 on success.
+        :rtype: int
+        """
+        if not specs:
+            self.write("No argument")
+            return 1
+
+        timings = []
+        start = time.time()
+        mods = self.get_modules()
+        timings.append(("catalog load", time.time() - start))
+
+        start = time.time()
+        resolver = FmModulesResolver(mods)
+        resolver.prepare()
+        timings.append(("pool build", time.time() - start))
+
+        start = time.time()
+        try:
+            ret = resolver.resolve("enable", specs)
+        except fm.exceptions.DependencyError as err:
+            self.write(str(err))
+            return 1
+        timings.append(("solve", time.time() - start))
+
+        self.write("Modules to enable:")
+        for mmd in ret.to_enable:
+            self.write("    {}".format(mmd.get_nvr()))
+        for title, pairs in (("upgrade", ret.to_upgrade), ("downgrade", ret.to_downgrade)):
+            if pairs:
+                self.write("Modules to {}:".format(title))
+            for from_mmd, to_mmd in pairs:
+                self.write("    {} -> {}".format(from_mmd.get_nvr(), to_mmd.get_nvr()))
+        if ret.to_disable:
+            self.write("Modules to disable:")
+        for mmd in ret.to_disable:
+            self.write("    {}".format(mmd.get_nvr()))
+
+        # The packages of the new modules and of the upgrade and downgrade
+        # targets are installed, the enabled modules they require only
+        # provide their repos to satisfy the dependencies.
+        targets = ret.to_enable + [to_mmd for _, to_mmd in ret.to_upgrade + ret.to_downgrade]
+        required = self.get_required_enabled_modules(mods, ret, targets)
+
+        base = fm.dnfbase.base
+        start = time.time()
+        try:
+            for repo in base.repos.iter_enabled():
+                repo.disable()
+            for mmd in targets + required:
+                mmd.repo.enable()
+            base.fill_sack()
+        except dnf.exceptions.Error as err:
+            self.write(str(err))
+            return 1
+        timings.append(("sack fill", time.time() - start))
+
+        start = time.time()
+        try:
+            for mmd in targets:
+                if "default" not in mmd.profiles:
+                    continue
+                for rpm in mmd.profiles["default"].rpms:
+                    base.install(rpm)
+            base.resolve()
+        except dnf.exceptions.Error as err:
+            self.write(str(err))
+            return 1
+        timings.append(("depsolve", time.time() - start))
+
+        self.write(fm.dnfbase.output.list_transaction(base.transaction))
+
+        self.write("Phase timings:")
+        for phase, elapsed in timings:
+            self.write("    {:<14}{:.3f} ms".format(phase, elapsed * 1000))
+        return 0
+
+    @staticmethod
+    def get_required_enabled_modules(mods, ret, targets):
+        """
+        Returns ModuleMetadata of the enabled modules which stay enabled
+        after the resolving result `ret` is applied and which are required
+        by the `targets`, directly or transitively.
+
+        :param Modules mods: Modules instance.
+        :param ModulesResolverResult ret: Resolving result.
+        :param list targets: ModuleMetadata of the modules to enable.
+        :rtype: list
+        """
+        closures = mods.catalog.closures
+        required = closures.get_closure(
+            closures.get_mask((mmd.name, mmd.stream) for mmd in targets))
+        leaving = set(mmd.name for mmd in ret.to_disable)
+        leaving.update(from_mmd.name for from_mmd, _ in ret.to_upgrade + ret.to_downgrade)
+        return [mmd for name, mmd in mods.items()
+                if name not in leaving and mmd.is_enabled()
+                and closures.get_mask([(mmd.name, mmd.stream)]) & required]
+
     @staticmethod
     def enable_only_installed_module(module_metadata):
         for repo in fm.dnfbase.base.repos.iter_enabled():
@@ -233,21 +387,41 @@ class Cli(object):
         return 0
 
     def get_modules(self):
-        mods = Modules(self.config_file, self.opts)
-        mods.load_modules()
-        return mods
+        """
+        Returns Modules instance with all the available modules. The module
+        metadata come from the process-wide catalog, so calling this method
+        repeatedly does not parse the repos again.
+        """
+        if self._modules is None:
+            self._modules = Modules(self.config_file, self.opts)
+            self._modules.load_modules()
+        return self._modules
 
-    def list_modules(self):
+    def list_modules(self, args=None):
         """
         Handles "list" command. Prints the short list of available modules.
 
-        :param string arg: Keyword to find the module according to,
-            or None for printing list of all modules.
+        :param args: Command line arguments with optional `limit`, `offset`
+            and `sort` attributes selecting the page of modules to print.
         :return: Error code, 0 on success.
         :rtype: int
         """
+        limit = getattr(args, "limit", None)
+        offset = getattr(args, "offset", 0)
+        sort = getattr(args, "sort", None)
+        if (limit is not None and limit < 0) or (offset is not None and offset < 0):
+            self.write("--limit and --offset cannot be negative.")
+            return 1
+        if sort and sort.lstrip("-") not in SORT_KEYS:
+            self.write("Unknown sort key {}. Valid keys: {}".format(
+                sort.lstrip("-"), ", ".join(sorted(SORT_KEYS))))
+            return 1
+
         mods = self.get_modules()
-        self.write(mods.get_brief_description(False))
+        if limit is None and not offset and not sort:
+            self.write_modules(args, mods.values())
+        else:
+            self.write_modules(args, mods.select(limit, offset, sort))
         return 0
 
     @staticmethod
@@ -257,15 +431,20 @@ class Cli(object):
             module.enable()
         base.update_cache()
 
-    def list_installed_modules(self):
+    def list_installed_modules(self, args=None):
         """
-        Handles "list-enabled" command. Prints the list of enabled modules.
+        Handles "list-installed" command. Prints the list of installed modules.
 
-        :param string arg: Keyword to find the module according to,
-            or None for printing list of all modules.
+        :param args: Command line arguments.
         :return: Error code, 0 on success.
         :rtype: int
         """
+        if self.is_jsonl(args):
+            self.writer.write_jsonl({"name": name, "profiles": profiles}
+                                    for name, profiles
+                                    in self.config_file.iter_installed_profiles())
+            return 0
+
         self.write(self.config_file.get_installed_profiles())
         return 0
 
@@ -278,40 +457,66 @@ class Cli(object):
         :rtype: int
         """
 
-        if not args._search_name or not args._search_requires or not args._search_license or not args.search_version or not args._search_json:
+        search_rpm = getattr(args, "_search_rpm", [])
+        search_fuzzy = getattr(args, "_search_fuzzy", [])
+        search_text = getattr(args, "_search_text", [])
+        search_whatrequires = getattr(args, "_search_whatrequires", [])
+        if not (args._search_name or args._search_requires or args._search_license or args.search_version or args._search_json or search_rpm or search_fuzzy or search_text or search_whatrequires):
             self.write("No arguments")
             return 1
 
-        mods = Modules(self.config_file, self.opts)
-        mods.load_modules()
+        if search_whatrequires:
+            if args._search_name or args._search_requires or args._search_license or args.search_version or args._search_json or search_rpm or search_fuzzy or search_text:
+                self.write("The --whatrequires option cannot be combined with other options. See help for more details.")
+                return 1
+            return self.search_dependents(args, search_whatrequires)
 
-        if len(mods) == 0:
+        if search_text:
+            if args._search_name or args._search_requires or args._search_license or args.search_version or args._search_json or search_rpm or search_fuzzy:
+                self.write("The --text option cannot be combined with other options. See help for more details.")
+                return 1
+            return self.search_text_modules(args, " ".join(search_text))
+
+        if search_fuzzy:
+            if args._search_name or args._search_requires or args._search_license or args.search_version or args._search_json or search_rpm:
+                self.write("The --fuzzy option cannot be combined with other options. See help for more details.")
+                return 1
             mods = self.get_modules()
+            limit = getattr(args, "limit", None) or 10
+            self.write_modules(args, mods.get_fuzzy_matches(" ".join(search_fuzzy), limit))
+            return 0
+
+        if search_rpm:
+            if args._search_name or args._search_requires or args._search_license or args.search_version or args._search_json:
+                self.write("The --rpm option cannot be combined with other options. See help for more details.")
+                return 1
+            return self.search_rpm_providers(args, search_rpm)
+
+        mods = self.get_modules()
 
         arg_dict = dict()
 
         #If the json argument is used, then parse json and ignore the rest of the parsing
         if args._search_json:
-            for argument in args:
-                if args._search_name or args._search_requires or args._search_license or args.search_version:
-                    self.write("The --json option cannot be combined with other options. See help for more details.")
-                    return 1
+            if args._search_name or args._search_requires or args._search_license or args.search_version:
+                self.write("The --json option cannot be combined with other options. See help for more details.")
+                return 1
 
             #Add a help option to describe the format for the --json arg
-            if args._search_jso == "help":
+            if args._search_json[0] == "help":
                 fn = sys.argv[0]
                 if fn.find("dnf") != -1:
                     fn += " module"
 
                 self.write("json code must be enclosed in single quotes ('') and entered in the following example format:")
                 self.write("   '{\"name\": [\"httpd\"], \"version\": [\"==\", \"2.2.15\"]}'\n")
-                self.write("Available fields are: name, release, version, requires, license \n")
+                self.write("Available fields are: name, release, version, requires, license, summary, description \n")
                 self.write("Note that each item in each field is written as a list, and multiple items may be added to each list, except in the case of \"version\" and \"release\", both of which require exactly 2 arguments.")
                 return 1
 
             #Attempt to parse the json text
             try:
-                tmp_dict = json.loads(args[2])
+                tmp_dict = json.loads(args._search_json[0])
 
                 for key in tmp_dict:
                     field = "_" + key
@@ -320,7 +525,7 @@ class Cli(object):
             except ValueError:
                 self.write("Invalid json format. See `--json help` for more details")
                 return 1
-        elif len(args) > 2:
+        else:
             if args.search_version:
                 if len(args.search_version) <= 1:
                     self.write("Insufficient number of arguments. --version requires the following 2 args: {inequality} {version number}")
@@ -332,28 +537,136 @@ class Cli(object):
                       self.write("Invalid inequality. (Make sure inequality is enclosed in quotes -- e.g., '<') Valid inequalities: <, >, <=, >=, ==, !=")
                       return 1
                 arg_dict["_version"] = args.search_version
-            if args.search_requires:
-                try:
-                    tmp = args.search_version[0]
-                    tmp = args.search_version[1]
-                except IndexError:
+            if args._search_requires:
+                if len(args._search_requires) < 2:
                     self.write("Insufficient number of args. --requires needs exactly 2 args.")
                     return 1
 
-                if len(arg_dict["_requires"]) > 2:
+                if len(args._search_requires) > 2:
                     self.write("Too many args. --requires requires the following 2 args: {module name} {module version}")
                     return 1
 
-                arg_dict["_requires"] = {args.search_version[0]: args.search_version[1]}
-            if args.search_name:
-                arg_dict["_name"] = args.search_name
-            if args.search_license:
-                arg_dict["_license"] = args.search_license
-        else:
-            self.write("Insufficient number of arguments.")
+                arg_dict["_requires"] = {args._search_requires[0]: args._search_requires[1]}
+            if args._search_name:
+                arg_dict["_name"] = args._search_name
+            if args._search_license:
+                arg_dict["_license"] = args._search_license
+
+        limit = getattr(args, "limit", None)
+        offset = getattr(args, "offset", 0) or 0
+        if (limit is not None and limit < 0) or offset < 0:
+            self.write("--limit and --offset cannot be negative.")
             return 1
 
-        matching_mods = mods.search(arg_dict)
-        self.write(matching_mods.get_brief_description())
+        mods_search = ModulesSearch(mods)
+        start = time.time()
+        matching = mods_search.iter_search(arg_dict)
+        if limit is not None or offset:
+            stop = offset + limit if limit is not None else None
+            matching = itertools.islice(matching, offset, stop)
+        if not self.is_jsonl(args):
+            # The brief description aligns the columns to all the rows, so
+            # only the JSON lines output is written as the matches come.
+            matching = list(matching)
+        self.write_modules(args, matching)
+        elapsed = time.time() - start
+
+        if getattr(args, "explain", False):
+            self.write_search_plan(args, mods_search.last_plan, elapsed)
 
         return 0
+
+    def write_search_plan(self, args, plan, elapsed):
+        """
+        Prints the steps of the search plan in the order they were
+        evaluated with their estimated and real number of matches.
+
+        :param args: Command line arguments.
+        :param list plan: SearchStep instances.
+        :param float elapsed: Total search time in seconds.
+        """
+        if self.is_jsonl(args):
+            self.writer.write_jsonl([{"plan": [{"step": step.desc,
+                                                "estimate": step.estimate,
+                                                "count": step.count,
+                                                "time": step.time}
+                                               for step in plan],
+                                      "time": elapsed}])
+            return
+
+        self.write("Search plan:")
+        for i, step in enumerate(plan):
+            self.write("    {}. {}".format(i + 1, step))
+        self.write("Total search time: {:.3f} ms".format(elapsed * 1000))
+
+    def search_dependents(self, args, required):
+        """
+        Handles "search --whatrequires" command. Prints the modules requiring
+        the given modules.
+
+        :param args: Command line arguments.
+        :param list required: Required modules as "name" or "name:stream".
+        :return: Error code, 0 on success.
+        :rtype: int
+        """
+        mods = self.get_modules()
+        transitive = getattr(args, "recursive", False)
+
+        dependents = []
+        for spec in required:
+            name, _, stream = spec.partition(":")
+            for mmd in mods.get_dependents(name, stream or None, transitive):
+                if mmd not in dependents:
+                    dependents.append(mmd)
+
+        self.write_modules(args, dependents)
+        return 0
+
+    def search_text_modules(self, args, text):
+        """
+        Handles "search --text" command. Prints the modules with summary and
+        description matching the text best.
+
+        :param args: Command line arguments.
+        :param string text: Query text.
+        :return: Error code, 0 on success.
+        :rtype: int
+        """
+        # The full-text index is persisted, so the modules are not loaded here.
+        mods = Modules(self.config_file, self.opts)
+        limit = getattr(args, "limit", None) or 10
+        results = mods.search_text(text, limit)
+
+        if self.is_jsonl(args):
+            self.writer.write_jsonl(dict(zip(("score", "name", "stream", "version", "summary"), row))
+                                    for row in results)
+        else:
+            self.writer.write_table([("{}:{}".format(name, stream), version,
+                                      "{:.2f}".format(score), summary)
+                                     for score, name, stream, version, summary in results])
+        return 0
+
+    def search_rpm_providers(self, args, rpms):
+        """
+        Handles "search --rpm" command. Prints the modules shipping the RPMs.
+
+        :param args: Command line arguments.
+        :param list rpms: RPM names.
+        :return: Error code, 0 on success.
+        :rtype: int
+        """
+        # The RPM index is persisted, so the modules are not loaded here.
+        mods = Modules(self.config_file, self.opts)
+
+        rows = []
+        for rpm in rpms:
+            for name, stream, version, role in mods.get_rpm_providers(rpm):
+                rows.append((rpm, name, stream, version, role))
+
+        if self.is_jsonl(args):
+            self.writer.write_jsonl(dict(zip(("rpm", "name", "stream", "version", "role"), row))
+                                    for row in rows)
+        else:
+            self.writer.write_table([(rpm, "{}:{}".format(name, stream), version, role)
+                                     for rpm, name, stream, version, role in rows])
+        return 0
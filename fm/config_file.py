@@ -98,6 +98,14 @@ class ConfigFile(ConfigParser):
     def load(self, config_file=None):
         self.read(config_file if config_file is not None else self._config_file)
 
+    def iter_installed_profiles(self):
+        """
+        Generates (module name, list of installed profiles) tuples.
+        """
+        for section in self.sections():
+            profiles = self.get(section, "profiles")
+            yield section, [p for p in profiles.split(",") if p]
+
     def get_installed_profiles(self):
         description = ""
 
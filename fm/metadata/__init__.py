@@ -181,7 +181,7 @@ class ModuleMetadata(object):
         if parsed_yaml["version"] not in supported_mdversions:
             raise ValueError("The supplied metadata version isn't supported")
 
-    def dump_to_string(self):
+    def dump_to_dict(self):
         data = dict()
         # header
         data["document"] = "modulemd"
@@ -225,7 +225,10 @@ class ModuleMetadata(object):
                     data["profiles"][profile]["rpms"] = \
                         list(self.profiles[profile].rpms)
 
-        return yaml.safe_dump(data)
+        return data
+
+    def dump_to_string(self):
+        return yaml.safe_dump(self.dump_to_dict())
 
     @property
     def mdversion(self):
@@ -473,12 +476,46 @@ class ModuleMetadata(object):
                 raise TypeError("profiles: data type not supported")
         self._profiles = d
 
+    @property
+    def api(self):
+        """A ModuleAPI instance representing the module's public API."""
+        return self._api
+
+    @api.setter
+    def api(self, o):
+        if not isinstance(o, ModuleAPI):
+            raise TypeError("api: data type not supported")
+        self._api = o
+
+    @property
+    def filter(self):
+        """A ModuleFilter instance representing the module's filter."""
+        return self._filter
+
+    @filter.setter
+    def filter(self, o):
+        if not isinstance(o, ModuleFilter):
+            raise TypeError("filter: data type not supported")
+        self._filter = o
+
+    @property
+    def components(self):
+        """A ModuleComponents instance property representing the components
+        defining the module, None when there are no components."""
+        return self._components
+
+    @components.setter
+    def components(self, o):
+        if o is not None and not isinstance(o, ModuleComponents):
+            raise TypeError("components: data type not supported")
+        self._components = o
+
 
 class ModuleMetadataLoader(object):
     def __init__(self, repo=None):
         self.repo = repo
 
-    def load(self):
+    def get_modules_file(self):
         if self.repo is None:
             raise Exception("Cannot load from cache dir: {}".format(self.repo))
 
@@ -488,7 +525,10 @@ class ModuleMetadataLoader(object):
 
         if len(modules_yaml_gz) == 0:
             raise Exception("Missing file *modules.yaml in metadata cache dir: {}".format(self.repo._cachedir))
-        modules_yaml_gz = "{}/repodata/{}".format(self.repo._cachedir, modules_yaml_gz[0])
+        return "{}/repodata/{}".format(self.repo._cachedir, modules_yaml_gz[0])
+
+    def load(self):
+        modules_yaml_gz = self.get_modules_file()
 
         with gzip.open(modules_yaml_gz, "r") as extracted_modules_yaml_gz:
             modules_yaml = extracted_modules_yaml_gz.read()
@@ -29,7 +29,7 @@ from fm.metadata.rpm_set import RPMSet
 class ModuleAPI(RPMSet):
     """Class representing a particular module API."""
     def __init__(self):
-        super(ModuleAPI).__init__()
+        super(ModuleAPI, self).__init__()
 
     def __repr__(self):
         return "<ModuleAPI: rpms: {}>".format(repr(sorted(self.rpms)))
@@ -29,7 +29,7 @@ from fm.metadata.rpm_set import RPMSet
 class ModuleFilter(RPMSet):
     """Class representing a particular module filter."""
     def __init__(self):
-        super(ModuleFilter).__init__()
+        super(ModuleFilter, self).__init__()
 
     def __repr__(self):
         return "<ModuleFilter: rpms: {}>".format(repr(sorted(self.rpms)))
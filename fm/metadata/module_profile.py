@@ -29,7 +29,7 @@ from fm.metadata.rpm_set import RPMSet
 class ModuleProfile(RPMSet):
     """Class representing a particular module profile."""
     def __init__(self):
-        super(ModuleProfile).__init__()
+        super(ModuleProfile, self).__init__()
         self._description = ""
 
     def __repr__(self):
@@ -70,29 +70,44 @@ class Module(object):
 
         return self.api.get_metadata_expire()
 
-    def _install_profile_rpms(self, profile_names):
+    def get_profile_rpms(self, profile_names):
         """
-        Installs RPMs defined in the Module's profile `profile_name`.
+        Returns the list of RPMs defined in the Module's profiles
+        `profile_names`, each RPM listed once.
         """
-
         if not self.mmd:
-            return
+            return []
 
         rpms = []
+        seen = set()
         for profile_name in profile_names:
             if not profile_name in self.mmd.profiles:
                 continue
 
-            profile = self.mmd.profiles[profile_name]
-            if len(profile.rpms) == 0:
-                continue
+            for rpm in self.mmd.profiles[profile_name].rpms:
+                if rpm not in seen:
+                    seen.add(rpm)
+                    rpms.append(rpm)
+        return rpms
+
+    def install_rpms(self, rpms):
+        """
+        Marks the `rpms` from the Module's repository for installation
+        in a single DNF call.
+        """
+        if len(rpms) == 0:
+            return
 
-            rpms += profile.rpms
+        fm.dnf_base.DNFBASE.dnf_install(rpms, self.name,
+                                        self.repo_file,
+                                        strict=True,
+                                        allow_erasing = True)
 
-            fm.dnf_base.DNFBASE.dnf_install(rpms, self.name,
-                                            self.repo_file,
-                                            strict=True,
-                                            allow_erasing = True)
+    def _install_profile_rpms(self, profile_names):
+        """
+        Installs RPMs defined in the Module's profiles `profile_names`.
+        """
+        self.install_rpms(self.get_profile_rpms(profile_names))
 
     def fetch_module_metadata(self):
         """
@@ -104,20 +119,34 @@ class Module(object):
             return True
         return False
 
-    def enable(self, profiles = ["default"], call_dnf = True):
+    def prepare(self, call_dnf = True):
+        """
+        Prepares the module for enablement - downloads the repository file
+        to $root/etc/yum.repos.d and fetches the full metadata. Touches only
+        this module's files, so different modules can be prepared
+        concurrently.
+
+        :param bool call_dnf: True if DNF is going to be called.
+        """
+        self.repo_file.create()
+        if call_dnf:
+            self.fetch_module_metadata()
+
+    def enable(self, profiles = ["default"], call_dnf = True, prepared = False):
         """
         Enables the module - downloads the repository file to
         $root/etc/yum.repos.d and installs all default packages for module.
 
         :param string root: Full path to root file-system.
         :param bool call_dnf: True if DNF should be called.
+        :param bool prepared: True if the prepare method was called already.
         :raises fm.exceptions.Error: If DNF exits with an error code.
         """
-        self.repo_file.create()
+        if not prepared:
+            self.prepare(call_dnf)
 
         # Install the packages according to chosen profile.
         if call_dnf:
-            self.fetch_module_metadata()
             try:
                 self._install_profile_rpms(profiles)
             except fm.exceptions.Error as err:
@@ -23,12 +23,21 @@ Client for fm-metadata-server API.
 
 from __future__ import print_function
 
+import heapq
+import itertools
 from collections import OrderedDict
 
 import fm.exceptions
-from fm.metadata import ModuleMetadataLoader
 from fm.modules_resolver.modules_resolver import FmModulesResolver
 from fm.modules_search import ModulesSearch
+from fm.modules_writer import brief_rows, full_rows
+
+#: Sort keys accepted by Modules.select.
+SORT_KEYS = {
+    "name": lambda mmd: (mmd.name, mmd.version),
+    "version": lambda mmd: (mmd.version, mmd.name),
+    "summary": lambda mmd: (mmd.summary, mmd.name),
+}
 
 
 class Modules(OrderedDict):
@@ -59,10 +68,75 @@ class Modules(OrderedDict):
 
         self.enabled_modules = []
 
+        #: Process-wide ModulesCatalog the modules are loaded from.
+        self.catalog = fm.catalog
+
     def load_modules(self):
-        for repo in self.available_repos:
-            for metadata in ModuleMetadataLoader(repo).load():
-                self[metadata.name] = metadata
+        """
+        Loads the modules from the available repos. The metadata are shared
+        with other Modules instances through the ModulesCatalog, so each
+        repo is parsed at most once per process.
+        """
+        for metadata in self.catalog.load(self.available_repos):
+            self[metadata.name] = metadata
+
+    def get_fuzzy_matches(self, text, limit=10):
+        """
+        Returns modules with name or summary similar to the `text`, the most
+        similar first. All the versions of each matching module are returned.
+
+        :param string text: Possibly misspelled module name.
+        :param int limit: Maximum number of matching module names.
+        :rtype: list
+        """
+        mods = []
+        for _, name in self.catalog.index.get_fuzzy_matches(text, limit):
+            mods.extend(self.catalog.get_modules_by_name(name))
+        return mods
+
+    def get_dependents(self, name, stream=None, transitive=False):
+        """
+        Returns modules requiring the module `name`, optionally only those
+        whose requirement can be satisfied by the `stream`. With
+        `transitive`, also the modules requiring it through other modules
+        are returned, the closest dependents first.
+
+        :param string name: Name of the required module.
+        :param string stream: Stream of the required module or None.
+        :param bool transitive: Return also indirect dependents.
+        :rtype: list
+        """
+        index = self.catalog.index
+        if not transitive:
+            return index.get_modules(index.get_dependents(name, stream))
+
+        depths = index.get_transitive_dependents(name, stream)
+        return [index.modules[mid]
+                for mid in sorted(depths, key=lambda mid: (depths[mid], mid))]
+
+    def get_rpm_providers(self, rpm):
+        """
+        Returns list of (module name, stream, version, role) tuples of
+        modules shipping the `rpm`. The RPM index is persisted in the cache,
+        so the modules do not have to be loaded to answer this.
+
+        :param string rpm: RPM name.
+        :rtype: list
+        """
+        return self.catalog.get_rpm_index(self.available_repos).lookup(rpm)
+
+    def search_text(self, text, limit=10):
+        """
+        Returns the `limit` modules with summary and description matching
+        the `text` best, ranked by BM25. The full-text index is persisted
+        in the cache, so the modules do not have to be loaded to answer this.
+
+        :param string text: Query text.
+        :param int limit: Maximum number of results.
+        :return: List of (score, name, stream, version, summary) tuples.
+        :rtype: list
+        """
+        return self.catalog.get_text_index(self.available_repos).search(text, limit)
 
     def search(self, keywords):
         """
@@ -106,42 +180,66 @@ class Modules(OrderedDict):
 
         return mods
 
-    def get_full_description(self, name):
+    def select(self, limit=None, offset=0, sort=None):
+        """
+        Returns at most `limit` modules starting at `offset`, optionally
+        sorted by the `sort` key. Only the first `offset + limit` modules
+        are selected using a heap, so the rest of the modules is never
+        sorted.
+
+        :param int limit: Maximum number of returned modules, None for all.
+        :param int offset: Number of modules to skip.
+        :param string sort: One of SORT_KEYS, prefixed by "-" for
+            descending order, or None to keep the catalog order.
+        :rtype: list
+        """
+        offset = offset or 0
+        if limit is not None and limit <= 0:
+            return []
+
+        if not sort:
+            stop = None if limit is None else offset + limit
+            return list(itertools.islice(self.values(), offset, stop))
+
+        reverse = sort.startswith("-")
+        sort = sort.lstrip("-")
+        if sort not in SORT_KEYS:
+            raise fm.exceptions.Error("Unknown sort key {}. Valid keys: {}".format(
+                sort, ", ".join(sorted(SORT_KEYS))))
+        key = SORT_KEYS[sort]
+
+        if limit is None:
+            return sorted(self.values(), key=key, reverse=reverse)[offset:]
+
+        if reverse:
+            selected = heapq.nlargest(offset + limit, self.values(), key=key)
+        else:
+            selected = heapq.nsmallest(offset + limit, self.values(), key=key)
+        return selected[offset:]
+
+    def get_sorted_modules(self, name):
+        """
+        Returns all modules matching the `name` sorted by version.
+
+        :raises fm.exceptions.DependencyError: If there is no such module.
+        """
         mods = self.get_modules(name)
         if not mods or len(mods) == 0:
-            raise fm.exceptions.DependencyError("Unknown module {}".format(name))
+            msg = "Unknown module {}".format(name)
+            suggestions = self.catalog.index.get_fuzzy_matches(name, 3)
+            if suggestions:
+                msg += ". Did you mean: {}?".format(
+                    ", ".join(suggestion for _, suggestion in suggestions))
+            raise fm.exceptions.DependencyError(msg)
 
-        mods = sorted(mods, key=lambda module: module.version)
+        return sorted(mods, key=lambda module: module.version)
 
-        ret = ""
-        for mod in mods:
-            ret += mod.dump_to_string() + "\n"
-        return ret[:-1] # remove last '\n'
+    def get_full_description(self, name):
+        return "\n".join(full_rows(self.get_sorted_modules(name)))
 
     def get_brief_description(self, only_enabled=False):
         """
         Returns brief description of all modules in this Modules instance.
         """
 
-        if len(self) == 0:
-            return ""
-
-        # Get the maximum width of the text we will show in each column
-        # of output.
-        max_name_width = max(len(name) for name in self.keys()) + 4  # padding
-        max_vr_width = (max(len(str(mod.version)) for mod in self.values()) + 4)  # padding
-
-        ret = ""
-        for module_metadata in self.values():
-            if only_enabled and module_metadata.is_enabled():
-                continue
-
-            vr = str(module_metadata.version)
-
-            # Show output in 3 columns...
-            ret += module_metadata.name.ljust(max_name_width)
-            ret += vr.ljust(max_vr_width)
-            ret += module_metadata.summary
-            ret += "\n"
-
-        return ret[:-1]  # remove last '\n'
+        return "\n".join(brief_rows(self.values(), only_enabled))
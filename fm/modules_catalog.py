@@ -0,0 +1,317 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""
+Process-wide catalog of the module metadata available in module repos.
+"""
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import fm
+from fm.metadata import ModuleMetadataLoader
+from fm.modules_closure import DependencyClosures
+from fm.modules_index import ModulesIndex
+from fm.modules_rpm_index import RPMIndex
+from fm.modules_text_index import TextIndex, build_text_index
+
+
+class ModulesCatalog(object):
+    """
+    Loads the module metadata of each repo at most once per process and
+    keeps the indexes built on top of them. The metadata of a repo are
+    loaded again only when its modules file changes.
+    """
+
+    def __init__(self):
+        """
+        Creates new ModulesCatalog instance.
+        """
+        #: Repo id -> (fingerprint, list of ModuleMetadata).
+        self._repos = OrderedDict()
+        #: Module name -> list of ModuleMetadata, None when not built yet.
+        self._by_name = None
+        #: ModulesIndex of the loaded metadata, None when not built yet.
+        self._index = None
+        #: DependencyClosures of the loaded metadata, None when not built
+        #: yet.
+        self._closures = None
+        #: (index kind, repo id) -> (fingerprint, persisted index data).
+        self._repo_indexes = {}
+        #: Index kind -> (repos fingerprints, index of these repos).
+        self._merged_indexes = {}
+        #: Directory where the indexes are persisted, None to use the
+        #: "fm" subdirectory of the DNF cache directory.
+        self.cache_dir = None
+
+    @staticmethod
+    def get_repo_fingerprint(repo):
+        """
+        Returns fingerprint of the modules file of the `repo`. The
+        fingerprint changes whenever the repo metadata are refreshed.
+
+        :param Repo repo: DNF module repo.
+        :rtype: tuple
+        """
+        modules_file = ModuleMetadataLoader(repo).get_modules_file()
+        st = os.stat(modules_file)
+        return (modules_file, st.st_mtime, st.st_size)
+
+    def get_repo_modules(self, repo):
+        """
+        Returns the list of ModuleMetadata available in the `repo`, loading
+        them only when they are not loaded yet or when they changed.
+
+        :param Repo repo: DNF module repo.
+        :rtype: list
+        """
+        fingerprint = self.get_repo_fingerprint(repo)
+        if repo.id in self._repos and self._repos[repo.id][0] == fingerprint:
+            return self._repos[repo.id][1]
+
+        modules = ModuleMetadataLoader(repo).load()
+        self._repos[repo.id] = (fingerprint, modules)
+        self.invalidate_indexes()
+        return modules
+
+    def load(self, repos):
+        """
+        Makes sure the metadata of all the `repos` are loaded and forgets
+        the metadata of the repos which are not among the `repos` anymore,
+        e.g. after they were disabled.
+
+        :param iterable repos: DNF module repos.
+        :return: This ModulesCatalog instance.
+        """
+        repo_ids = set()
+        for repo in repos:
+            repo_ids.add(repo.id)
+            self.get_repo_modules(repo)
+        for repo_id in list(self._repos):
+            if repo_id not in repo_ids:
+                self.invalidate(repo_id)
+        return self
+
+    def invalidate(self, repo_id=None):
+        """
+        Forgets the loaded metadata of the repo with `repo_id`, or of all
+        the repos when `repo_id` is None.
+        """
+        if repo_id is None:
+            self._repos.clear()
+            self._repo_indexes.clear()
+        else:
+            self._repos.pop(repo_id, None)
+            for key in list(self._repo_indexes):
+                if key[1] == repo_id:
+                    del self._repo_indexes[key]
+        self._merged_indexes.clear()
+        self.invalidate_indexes()
+
+    def invalidate_indexes(self):
+        """
+        Drops the indexes built on top of the loaded metadata. They are
+        rebuilt lazily on next access.
+        """
+        self._by_name = None
+        self._index = None
+        self._closures = None
+
+    def get_cache_dir(self):
+        """
+        Returns the directory where the indexes are persisted.
+        """
+        if self.cache_dir is not None:
+            return self.cache_dir
+        return os.path.join(fm.dnfbase.base.conf.cachedir, "fm")
+
+    def get_cache_file(self, kind, repo_id):
+        """
+        Returns path to the file with persisted index of the `kind`
+        for the repo with `repo_id`.
+        """
+        return os.path.join(self.get_cache_dir(), "{}.{}.json".format(repo_id, kind))
+
+    def load_cache_file(self, kind, repo_id, fingerprint):
+        """
+        Returns the data persisted by store_cache_file, or None when there
+        are no data or when they were stored for different `fingerprint`.
+        """
+        try:
+            with open(self.get_cache_file(kind, repo_id)) as f:
+                cached = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if cached.get("fingerprint") != list(fingerprint):
+            return None
+        return cached.get("data")
+
+    def store_cache_file(self, kind, repo_id, fingerprint, data):
+        """
+        Persists JSON serializable `data` of the index of the `kind` for
+        the repo with `repo_id`. Nothing is stored when the cache directory
+        is not writable.
+        """
+        cache_file = self.get_cache_file(kind, repo_id)
+        tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(cache_file)):
+                os.makedirs(os.path.dirname(cache_file))
+            with open(tmp_file, "w") as f:
+                json.dump({"fingerprint": list(fingerprint), "data": data}, f)
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError):
+            pass
+
+    def store_repo_index(self, kind, repo_id, fingerprint, data):
+        """
+        Keeps the index `data` of the `kind` for the repo in memory and
+        persists them in the cache directory.
+        """
+        self._repo_indexes[(kind, repo_id)] = (fingerprint, data)
+        self.store_cache_file(kind, repo_id, fingerprint, data)
+
+    def get_repo_index(self, kind, repo, build):
+        """
+        Returns the data of the persisted index of the `kind` for the
+        `repo`. The data are taken from memory or from the cache directory
+        when the repo did not change since they were stored, otherwise they
+        are built by `build(modules)` from the repo's metadata and stored.
+        Only the indexes of the changed repos are rebuilt.
+
+        :param string kind: Kind of the index, used in the cache file name.
+        :param Repo repo: DNF module repo.
+        :param callable build: Function returning JSON serializable index
+            data from the list of ModuleMetadata.
+        """
+        fingerprint = self.get_repo_fingerprint(repo)
+        cached = self._repo_indexes.get((kind, repo.id))
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+        data = self.load_cache_file(kind, repo.id, fingerprint)
+        if data is not None:
+            self._repo_indexes[(kind, repo.id)] = (fingerprint, data)
+            return data
+
+        data = build(self.get_repo_modules(repo))
+        self.store_repo_index(kind, repo.id, fingerprint, data)
+        return data
+
+    def get_merged_index(self, kind, repos, build, merge):
+        """
+        Returns index of the `kind` for all the `repos`, merged from the
+        per-repo indexes by `merge(list of index data)`. The merged index is
+        kept until some of the repos changes.
+        """
+        key = []
+        datas = []
+        for repo in repos:
+            datas.append(self.get_repo_index(kind, repo, build))
+            key.append((repo.id, self._repo_indexes[(kind, repo.id)][0]))
+
+        cached = self._merged_indexes.get(kind)
+        if cached is None or cached[0] != key:
+            cached = (key, merge(datas))
+            self._merged_indexes[kind] = cached
+        return cached[1]
+
+    def get_rpm_index(self, repos):
+        """
+        Returns RPMIndex of all the RPMs shipped by the modules in `repos`.
+        The index of a repo is read from the cache directory when the repo
+        did not change since it was stored, so its metadata do not have to
+        be parsed.
+
+        :param iterable repos: DNF module repos.
+        :rtype: RPMIndex
+        """
+        return self.get_merged_index(
+            "rpms", repos,
+            lambda modules: RPMIndex.from_modules(modules).rpms,
+            RPMIndex.merge)
+
+    def get_text_index(self, repos):
+        """
+        Returns full-text TextIndex of the modules in `repos`. The index of
+        a repo is persisted in the cache directory and rebuilt only when
+        the repo changes.
+
+        :param iterable repos: DNF module repos.
+        :rtype: TextIndex
+        """
+        return self.get_merged_index("text", repos, build_text_index, TextIndex)
+
+    def get_fingerprint(self):
+        """
+        Returns fingerprint of the whole catalog.
+
+        :rtype: string
+        """
+        digest = hashlib.sha1()
+        for repo_id, (fingerprint, _) in sorted(self._repos.items()):
+            digest.update(repr((repo_id, fingerprint)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def __iter__(self):
+        for _, modules in self._repos.values():
+            for mmd in modules:
+                yield mmd
+
+    def __len__(self):
+        return sum(len(modules) for _, modules in self._repos.values())
+
+    @property
+    def by_name(self):
+        """
+        Index of the loaded metadata: module name -> list of ModuleMetadata.
+        """
+        if self._by_name is None:
+            self._by_name = OrderedDict()
+            for mmd in self:
+                self._by_name.setdefault(mmd.name, []).append(mmd)
+        return self._by_name
+
+    def get_modules_by_name(self, name):
+        """
+        Returns the list of ModuleMetadata of module `name`, or an empty
+        list when there is no such module.
+        """
+        return self.by_name.get(name, [])
+
+    @property
+    def index(self):
+        """
+        Inverted ModulesIndex of the loaded metadata.
+        """
+        if self._index is None:
+            self._index = ModulesIndex(self)
+        return self._index
+
+    @property
+    def closures(self):
+        """
+        DependencyClosures of the streams of the loaded metadata.
+        """
+        if self._closures is None:
+            self._closures = DependencyClosures(self)
+        return self._closures
@@ -0,0 +1,229 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""
+Transitive dependency closures of module streams stored as bitsets.
+"""
+
+from __future__ import print_function
+
+
+def _is_pinned(stream):
+    """
+    Returns True when the required `stream` is set. The modulemd parsing
+    stores missing streams also as "None".
+    """
+    return bool(stream) and stream != "None"
+
+
+def iter_bits(mask):
+    """
+    Generates the positions of the bits set in the `mask`.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def close(direct):
+    """
+    Returns the transitive closures of the dependency graph.
+
+    :param list direct: Node -> list of nodes it depends on directly.
+    :return: Node -> bitmask of all the nodes it depends on.
+    :rtype: list
+    """
+    count = len(direct)
+    pending = [0] * count
+    dependents = [[] for _ in range(count)]
+    for node, deps in enumerate(direct):
+        for dep in deps:
+            pending[node] += 1
+            dependents[dep].append(node)
+
+    # Dependencies are closed before their dependents, so each closure is
+    # final when it is computed.
+    closures = [0] * count
+    ready = [node for node in range(count) if pending[node] == 0]
+    while ready:
+        node = ready.pop()
+        mask = 0
+        for dep in direct[node]:
+            mask |= (1 << dep) | closures[dep]
+        closures[node] = mask
+        for dependent in dependents[node]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+
+    # Nodes in dependency cycles and their dependents are closed by
+    # propagating the closures until nothing changes.
+    cyclic = [node for node in range(count) if pending[node] > 0]
+    changed = True
+    while changed:
+        changed = False
+        for node in cyclic:
+            mask = closures[node]
+            for dep in direct[node]:
+                mask |= (1 << dep) | closures[dep]
+            if mask != closures[node]:
+                closures[node] = mask
+                changed = True
+    return closures
+
+
+class DependencyClosures(object):
+    """
+    Precomputed transitive dependencies between module streams. Every
+    (name, stream) pair of the catalog has its bit, so sets of streams are
+    plain Python integers and the dependency queries are bitwise
+    operations.
+
+    Two closures are kept for each stream:
+
+    - may: streams required by some version of the stream, directly or
+      transitively. Requirements without stream require all the streams.
+    - must: streams required by all the versions of the stream, directly or
+      transitively.
+    """
+
+    def __init__(self, modules):
+        """
+        Creates new DependencyClosures instance of the `modules`.
+
+        :param iterable modules: ModuleMetadata instances.
+        """
+        #: List of (name, stream) pairs, the position is the bit.
+        self.streams = []
+        #: (name, stream) -> bit.
+        self.bits = {}
+        #: Module name -> mask of its streams.
+        self.name_masks = {}
+
+        requires = []
+        for mmd in modules:
+            key = (mmd.name, mmd.stream)
+            if key not in self.bits:
+                self.bits[key] = len(self.streams)
+                self.streams.append(key)
+                self.name_masks[mmd.name] = self.name_masks.get(mmd.name, 0) | (1 << self.bits[key])
+                requires.append([])
+            requires[self.bits[key]].append(mmd.requires)
+
+        may = []
+        must = []
+        for versions in requires:
+            may_deps = set()
+            must_deps = None
+            for reqs in versions:
+                deps = set()
+                for name, stream in reqs.items():
+                    # The required stream can pin a version, "stream:version".
+                    stream = str(stream).partition(":")[0]
+                    if _is_pinned(stream):
+                        mask = 1 << self.bits[(name, stream)] if (name, stream) in self.bits else 0
+                    else:
+                        mask = self.name_masks.get(name, 0)
+                    may_deps.update(iter_bits(mask))
+                    # Only a requirement satisfied by a single stream
+                    # determines the stream.
+                    if mask and mask & (mask - 1) == 0:
+                        deps.add(mask.bit_length() - 1)
+                must_deps = deps if must_deps is None else must_deps & deps
+            may.append(sorted(may_deps))
+            must.append(sorted(must_deps or ()))
+
+        #: Stream bit -> mask of streams it may require.
+        self.may = close(may)
+        #: Stream bit -> mask of streams it always requires.
+        self.must = close(must)
+
+    def get_mask(self, keys):
+        """
+        Returns the mask of the (name, stream) `keys`, unknown keys are
+        skipped.
+        """
+        mask = 0
+        for key in keys:
+            bit = self.bits.get(key)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def get_keys(self, mask):
+        """
+        Returns the list of (name, stream) pairs in the `mask`.
+        """
+        return [self.streams[bit] for bit in iter_bits(mask)]
+
+    def get_closure(self, mask, must=False):
+        """
+        Returns the mask of the streams required by the streams in the
+        `mask`, directly or transitively.
+
+        :param bool must: Return only the streams required by all the
+            versions, see the class documentation.
+        """
+        closures = self.must if must else self.may
+        closure = 0
+        for bit in iter_bits(mask):
+            closure |= closures[bit]
+        return closure
+
+    def get_orphans(self, enabled, kept, removed=None):
+        """
+        Returns the mask of the `enabled` streams which are not in `kept`
+        and are not required by any other enabled stream which stays.
+
+        :param int enabled: Mask of the enabled streams.
+        :param int kept: Mask of the streams to keep, for example the ones
+            enabled by the user.
+        :param int removed: Mask of the streams being removed. When set,
+            only the streams required by them are returned.
+        """
+        if removed is None:
+            removed = 0
+            candidates = enabled & ~kept
+        else:
+            candidates = enabled & self.get_closure(removed) & ~kept & ~removed
+
+        # Streams required by the staying ones stay as well, which can make
+        # other candidates required again.
+        while candidates:
+            staying = enabled & ~removed & ~candidates
+            needed = candidates & self.get_closure(staying)
+            if not needed:
+                break
+            candidates &= ~needed
+        return candidates
+
+    def get_conflicts(self, mask):
+        """
+        Returns the names of modules with more than one stream in the `mask`
+        together with the streams always required by them. Such modules
+        cannot be enabled together.
+
+        :return: Module name -> list of conflicting streams.
+        :rtype: dict
+        """
+        mask |= self.get_closure(mask, must=True)
+        conflicts = {}
+        for name, stream in self.get_keys(mask):
+            conflicts.setdefault(name, []).append(stream)
+        return dict((name, sorted(streams)) for name, streams in conflicts.items()
+                    if len(streams) > 1)
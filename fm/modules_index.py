@@ -0,0 +1,530 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""
+Inverted index of the module metadata used by ModulesSearch.
+"""
+
+from __future__ import print_function
+
+import bisect
+import heapq
+import re
+
+#: Regular expression matching single word in summary or description.
+TOKEN_RE = re.compile(r"\w+(?:[.+-]\w+)*", re.UNICODE)
+
+#: Regular expression matching numeric and alphabetic version segments.
+VERSION_SEGMENT_RE = re.compile(r"\d+|[a-zA-Z]+")
+
+#: Inequalities supported by SortedValueIndex.
+INEQUALITIES = ("==", "!=", "<", "<=", ">", ">=")
+
+#: Minimal trigram similarity of fuzzy matches.
+FUZZY_MIN_SCORE = 0.3
+#: Weight of the summary words similarity relative to the name similarity.
+FUZZY_SUMMARY_WEIGHT = 0.8
+
+
+def tokenize(text):
+    """
+    Splits the `text` to lower-case words.
+
+    :param string text: Text to tokenize.
+    :rtype: list
+    """
+    return [token.lower() for token in TOKEN_RE.findall(text)]
+
+
+def version_key(value):
+    """
+    Returns the sort key of version or stream `value` following the RPM
+    version comparison: the value is split to numeric and alphabetic
+    segments, numeric segments are compared as numbers and are newer than
+    alphabetic ones, so "1.10" > "1.9" and "10" > "9".
+
+    :param value: Version or stream.
+    :rtype: tuple
+    """
+    return tuple((1, int(seg), "") if seg.isdigit() else (0, 0, seg)
+                 for seg in VERSION_SEGMENT_RE.findall(str(value)))
+
+
+def trigrams(text):
+    """
+    Returns the set of trigrams of the lower-case `text` padded by spaces,
+    so also short words and word boundaries have trigrams.
+
+    :rtype: set
+    """
+    text = "  {} ".format(text.lower())
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class TrigramIndex(object):
+    """
+    Maps trigrams to the keys whose texts contain them, ranking the keys
+    by trigram similarity to a query text.
+    """
+
+    def __init__(self):
+        """
+        Creates new TrigramIndex instance.
+        """
+        #: Trigram -> set of keys.
+        self.postings = {}
+        #: Key -> number of trigrams of its text.
+        self.sizes = {}
+
+    def add(self, key, text):
+        """
+        Indexes the `text` under the `key`.
+        """
+        grams = trigrams(text)
+        self.sizes[key] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(key)
+
+    def search(self, text, min_score=FUZZY_MIN_SCORE):
+        """
+        Returns dictionary of keys with the Jaccard similarity of their
+        trigrams and the trigrams of `text` at least `min_score`.
+
+        :rtype: dict
+        """
+        grams = trigrams(text)
+        shared = {}
+        for gram in grams:
+            for key in self.postings.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+
+        scores = {}
+        for key, count in shared.items():
+            score = count / float(len(grams) + self.sizes[key] - count)
+            if score >= min_score:
+                scores[key] = score
+        return scores
+
+
+class SortedValueIndex(object):
+    """
+    Module ids sorted by the version key of some module metadata field,
+    answering inequality queries by bisecting.
+    """
+
+    def __init__(self, items):
+        """
+        Creates new SortedValueIndex instance.
+
+        :param iterable items: (version key, module id) tuples.
+        """
+        items = sorted(items)
+        #: Sorted version keys.
+        self.keys = [key for key, _ in items]
+        #: Module ids in the order of `keys`.
+        self.ids = [mid for _, mid in items]
+
+    def ranges(self, inequality, key):
+        """
+        Returns list of (start, stop) ranges of positions in `ids` whose
+        keys satisfy the `inequality` with the `key`.
+
+        :rtype: list
+        """
+        if inequality not in INEQUALITIES:
+            raise ValueError("Unknown inequality {}".format(inequality))
+
+        left = bisect.bisect_left(self.keys, key)
+        right = bisect.bisect_right(self.keys, key, left)
+        end = len(self.keys)
+        return {
+            "==": [(left, right)],
+            "!=": [(0, left), (right, end)],
+            "<": [(0, left)],
+            "<=": [(0, right)],
+            ">": [(right, end)],
+            ">=": [(left, end)],
+        }[inequality]
+
+    def select(self, inequality, key):
+        """
+        Returns set of module ids satisfying the `inequality`.
+
+        :rtype: set
+        """
+        ids = set()
+        for start, stop in self.ranges(inequality, key):
+            ids.update(self.ids[start:stop])
+        return ids
+
+    def count(self, inequality, key):
+        """
+        Returns number of module ids satisfying the `inequality`.
+
+        :rtype: int
+        """
+        return sum(stop - start for start, stop in self.ranges(inequality, key))
+
+
+def compare(inequality, left, right):
+    """
+    Returns the result of `left <inequality> right`.
+    """
+    if inequality == "==":
+        return left == right
+    elif inequality == "!=":
+        return left != right
+    elif inequality == "<":
+        return left < right
+    elif inequality == "<=":
+        return left <= right
+    elif inequality == ">":
+        return left > right
+    elif inequality == ">=":
+        return left >= right
+    raise ValueError("Unknown inequality {}".format(inequality))
+
+
+class ModulesIndex(object):
+    """
+    Maps tokens of the module metadata fields to posting lists. The posting
+    list is a set of module ids, which are positions of the modules in the
+    `modules` list.
+
+    Tokens of the indexed fields are:
+
+    - name: the module name as it is.
+    - summary, description: lower-case words.
+    - license: lower-case license names.
+    - requires: the required module name and "name:stream" pair. The
+      version pinned by the "stream:version" requirement is indexed also
+      in the "name:stream:version" token.
+    """
+
+    #: Indexed fields.
+    FIELDS = ("name", "summary", "description", "license", "requires")
+
+    #: Fields with sorted value indexes: field -> value getter.
+    VALUE_FIELDS = {
+        "version": lambda mmd: str(mmd.version),
+        "stream": lambda mmd: mmd.stream,
+    }
+
+    def __init__(self, modules):
+        """
+        Creates new ModulesIndex instance and indexes the `modules`.
+
+        :param iterable modules: ModuleMetadata instances to index.
+        """
+        #: List of indexed ModuleMetadata, module id is the position here.
+        self.modules = list(modules)
+        #: Field name -> token -> set of module ids.
+        self.postings = dict((field, {}) for field in self.FIELDS)
+        #: Sorted list of module names, None when not built yet.
+        self._sorted_names = None
+        #: Field -> list of version keys indexed by module id.
+        self._value_keys = {}
+        #: (field, module name or None) -> SortedValueIndex.
+        self._value_indexes = {}
+        #: Required module name -> list of (dependent module id, required
+        #: stream), None when not built yet.
+        self._reverse_requires = None
+        #: TrigramIndex of module names, None when not built yet.
+        self._name_trigrams = None
+        #: TrigramIndex of summary words, None when not built yet.
+        self._summary_trigrams = None
+
+        for mid, mmd in enumerate(self.modules):
+            for field, tokens in self.get_tokens(mmd).items():
+                postings = self.postings[field]
+                for token in tokens:
+                    postings.setdefault(token, set()).add(mid)
+
+    @staticmethod
+    def get_tokens(mmd):
+        """
+        Returns the tokens of all the indexed fields of the module.
+
+        :param ModuleMetadata mmd: Module metadata.
+        :return: Field name -> set of tokens.
+        :rtype: dict
+        """
+        requires = set()
+        for name, stream in mmd.requires.items():
+            requires.add(name)
+            requires.add("{}:{}".format(name, stream))
+            requires.add("{}:{}".format(name, str(stream).partition(":")[0]))
+
+        return {
+            "name": set([mmd.name]),
+            "summary": set(tokenize(mmd.summary)),
+            "description": set(tokenize(mmd.description)),
+            "license": set(license.lower() for license in mmd.licenses),
+            "requires": requires,
+        }
+
+    @staticmethod
+    def normalize(field, token):
+        """
+        Normalizes the query `token` the same way the tokens of the `field`
+        are normalized when indexing.
+        """
+        if field == "name" or field == "requires":
+            return token
+        return token.lower()
+
+    @property
+    def sorted_names(self):
+        """
+        Sorted list of the indexed module names.
+        """
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.postings["name"])
+        return self._sorted_names
+
+    def all_ids(self):
+        """
+        Returns the set of ids of all indexed modules.
+        """
+        return set(range(len(self.modules)))
+
+    def lookup(self, field, token):
+        """
+        Returns the posting list of the `token` in the `field`. The returned
+        set must not be modified.
+
+        :rtype: set
+        """
+        return self.postings[field].get(self.normalize(field, token), set())
+
+    def match_any(self, field, tokens):
+        """
+        Returns ids of modules having at least one of the `tokens` in the
+        `field`.
+
+        :rtype: set
+        """
+        ids = set()
+        for token in tokens:
+            ids |= self.lookup(field, token)
+        return ids
+
+    def match_all(self, field, tokens):
+        """
+        Returns ids of modules having all the `tokens` in the `field`.
+
+        :rtype: set
+        """
+        postings = sorted((self.lookup(field, token) for token in tokens), key=len)
+        if not postings:
+            return self.all_ids()
+
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            ids &= posting
+            if not ids:
+                break
+        return ids
+
+    def estimate_any(self, field, tokens):
+        """
+        Returns upper bound of the number of modules matched by match_any.
+        """
+        return min(len(self.modules),
+                   sum(len(self.lookup(field, token)) for token in tokens))
+
+    def estimate_all(self, field, tokens):
+        """
+        Returns upper bound of the number of modules matched by match_all.
+        """
+        if not tokens:
+            return len(self.modules)
+        return min(len(self.lookup(field, token)) for token in tokens)
+
+    def get_modules(self, ids):
+        """
+        Returns the ModuleMetadata for the module `ids` in the catalog order.
+
+        :rtype: list
+        """
+        return [self.modules[mid] for mid in sorted(ids)]
+
+    def get_value(self, field, mid):
+        """
+        Returns the value of the `field` of module with id `mid`.
+        """
+        return self.VALUE_FIELDS[field](self.modules[mid])
+
+    def get_value_keys(self, field):
+        """
+        Returns list of version keys of the `field` indexed by module id.
+        """
+        if field not in self._value_keys:
+            getter = self.VALUE_FIELDS[field]
+            self._value_keys[field] = [version_key(getter(mmd)) for mmd in self.modules]
+        return self._value_keys[field]
+
+    def get_value_index(self, field, name=None):
+        """
+        Returns SortedValueIndex of the `field` of all modules or only of
+        the modules called `name`.
+        """
+        if (field, name) not in self._value_indexes:
+            keys = self.get_value_keys(field)
+            if name is None:
+                ids = range(len(self.modules))
+            else:
+                ids = self.lookup("name", name)
+            self._value_indexes[(field, name)] = SortedValueIndex(
+                (keys[mid], mid) for mid in ids)
+        return self._value_indexes[(field, name)]
+
+    def estimate_inequality(self, field, inequality, value, names=None):
+        """
+        Returns number of modules matched by match_inequality without
+        candidates. It costs only a bisection of the sorted indexes.
+        """
+        key = version_key(value)
+        if names is None:
+            return self.get_value_index(field).count(inequality, key)
+        return sum(self.get_value_index(field, name).count(inequality, key)
+                   for name in names)
+
+    def match_inequality(self, field, inequality, value, names=None, candidates=None):
+        """
+        Returns ids of modules whose `field` satisfies the `inequality`
+        with the `value`.
+
+        :param string field: One of VALUE_FIELDS.
+        :param string inequality: One of INEQUALITIES.
+        :param string value: Version or stream to compare with.
+        :param iterable names: Search only modules with these names, None
+            to search all modules.
+        :param set candidates: Ids of modules to filter, None for all. When
+            there are fewer candidates than matching modules in the sorted
+            index, the candidates are compared one by one instead.
+        :rtype: set
+        """
+        key = version_key(value)
+        if names is None:
+            indexes = [self.get_value_index(field)]
+        else:
+            indexes = [self.get_value_index(field, name) for name in names]
+
+        if candidates is not None:
+            count = sum(index.count(inequality, key) for index in indexes)
+            if len(candidates) < count:
+                keys = self.get_value_keys(field)
+                names = None if names is None else set(names)
+                return set(mid for mid in candidates
+                           if compare(inequality, keys[mid], key)
+                           and (names is None or self.modules[mid].name in names))
+
+        ids = set()
+        for index in indexes:
+            ids |= index.select(inequality, key)
+        if candidates is not None:
+            ids &= candidates
+        return ids
+
+    def get_fuzzy_matches(self, text, limit=10):
+        """
+        Returns names of modules whose name or summary words are similar
+        to the `text`, ranked from the most similar.
+
+        :param string text: Possibly misspelled module name or word.
+        :param int limit: Maximum number of returned names.
+        :return: List of (score, module name) tuples.
+        :rtype: list
+        """
+        if self._name_trigrams is None:
+            self._name_trigrams = TrigramIndex()
+            for name in self.postings["name"]:
+                self._name_trigrams.add(name, name)
+            self._summary_trigrams = TrigramIndex()
+            for word in self.postings["summary"]:
+                self._summary_trigrams.add(word, word)
+
+        scores = self._name_trigrams.search(text)
+        for word, score in self._summary_trigrams.search(text.lower()).items():
+            score *= FUZZY_SUMMARY_WEIGHT
+            for mid in self.postings["summary"][word]:
+                name = self.modules[mid].name
+                if score > scores.get(name, 0):
+                    scores[name] = score
+
+        best = heapq.nsmallest(limit, scores.items(),
+                               key=lambda item: (-item[1], item[0]))
+        return [(score, name) for name, score in best]
+
+    @property
+    def reverse_requires(self):
+        """
+        Dependency reverse index: required module name -> list of
+        (id of the module requiring it, required stream) tuples. The
+        version pinned by the "stream:version" requirement is dropped.
+        """
+        if self._reverse_requires is None:
+            self._reverse_requires = {}
+            for mid, mmd in enumerate(self.modules):
+                for name, stream in mmd.requires.items():
+                    stream = str(stream).partition(":")[0]
+                    self._reverse_requires.setdefault(name, []).append((mid, stream))
+        return self._reverse_requires
+
+    def get_dependents(self, name, stream=None):
+        """
+        Returns ids of modules directly requiring the module `name`. When
+        the `stream` is set, only the requirements which can be satisfied
+        by that stream are considered.
+
+        :rtype: set
+        """
+        ids = set()
+        for mid, required_stream in self.reverse_requires.get(name, ()):
+            if (stream is None or required_stream in (None, "", "None")
+                    or required_stream == stream):
+                ids.add(mid)
+        return ids
+
+    def get_transitive_dependents(self, name, stream=None):
+        """
+        Returns ids of modules requiring the module `name` directly or
+        through other modules, with the length of the shortest dependency
+        chain.
+
+        :return: Module id -> depth, 1 for the direct dependents.
+        :rtype: dict
+        """
+        depths = {}
+        frontier = [(name, stream)]
+        depth = 0
+        visited = set(frontier)
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for required in frontier:
+                for mid in self.get_dependents(*required):
+                    if mid in depths:
+                        continue
+                    depths[mid] = depth
+                    mmd = self.modules[mid]
+                    if (mmd.name, mmd.stream) not in visited:
+                        visited.add((mmd.name, mmd.stream))
+                        next_frontier.append((mmd.name, mmd.stream))
+            frontier = next_frontier
+        return depths
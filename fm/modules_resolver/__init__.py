@@ -18,6 +18,8 @@
 # Red Hat, Inc.
 #
 
+import os
+
 import solv
 
 
@@ -51,6 +53,8 @@ class ModulesResolverProblem(object):
     def __init__(self, id2mmd, problem):
         """
         Creates new ModulesResolverProblem instance.
+
+        :param list id2mmd: ModuleMetadata indexed by the solvable id.
         """
         #: User-leve description of the problem
         self.desc = str(problem)
@@ -58,12 +62,13 @@ class ModulesResolverProblem(object):
         self.other_mmd = None
         self.dep = None
 
-        if problem.findproblemrule().info().solvable:
-            self.mmd = id2mmd[problem.findproblemrule().info().solvable]
-        if problem.findproblemrule().info().othersolvable:
-            self.other_mmd = id2mmd[problem.findproblemrule().info().othersolvable]
-        if problem.findproblemrule().info().dep:
-            self.dep = problem.findproblemrule().info().dep
+        info = problem.findproblemrule().info()
+        if info.solvable:
+            self.mmd = id2mmd[info.solvable.id]
+        if info.othersolvable:
+            self.other_mmd = id2mmd[info.othersolvable.id]
+        if info.dep:
+            self.dep = info.dep
 
         #: List of acceptable solution. One of these solutions
         #: should be passed to ModulesResolver.solve_install
@@ -86,6 +91,8 @@ class ModulesResolverResult(object):
     def __init__(self, id2mmd, problems, trans = None):
         """
         Creates new ModulesResolver instance.
+
+        :param list id2mmd: ModuleMetadata indexed by the solvable id.
         """
 
         #: List of modules to erase to fulfill the dependencies.
@@ -108,19 +115,55 @@ class ModulesResolverResult(object):
             return
 
         for cl in trans.classify(solv.Transaction.SOLVER_TRANSACTION_SHOW_OBSOLETES | solv.Transaction.SOLVER_TRANSACTION_OBSOLETE_IS_UPGRADE):
-            for p in cl.solvables():
-                if cl.type == solv.Transaction.SOLVER_TRANSACTION_ERASE:
-                    self.to_disable.append(id2mmd[p])
-                elif cl.type == solv.Transaction.SOLVER_TRANSACTION_INSTALL:
-                    self.to_enable.append(id2mmd[p])
-                elif cl.type == solv.Transaction.SOLVER_TRANSACTION_REINSTALLED:
-                    self.to_reinstall.append(id2mmd[p])
-                elif cl.type == solv.Transaction.SOLVER_TRANSACTION_DOWNGRADED:
-                    op = trans.othersolvable(p)
-                    self.to_downgrade.append((id2mmd[p], id2mmd[op]))
-                elif cl.type == solv.Transaction.SOLVER_TRANSACTION_UPGRADED:
-                    op = trans.othersolvable(p)
-                    self.to_upgrade.append((id2mmd[p], id2mmd[op]))
+            if cl.type == solv.Transaction.SOLVER_TRANSACTION_ERASE:
+                self.to_disable += [id2mmd[p.id] for p in cl.solvables()]
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_INSTALL:
+                self.to_enable += [id2mmd[p.id] for p in cl.solvables()]
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_REINSTALLED:
+                self.to_reinstall += [id2mmd[p.id] for p in cl.solvables()]
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_DOWNGRADED:
+                self.to_downgrade += [(id2mmd[p.id], id2mmd[trans.othersolvable(p).id])
+                                      for p in cl.solvables()]
+            elif cl.type == solv.Transaction.SOLVER_TRANSACTION_UPGRADED:
+                self.to_upgrade += [(id2mmd[p.id], id2mmd[trans.othersolvable(p).id])
+                                    for p in cl.solvables()]
+
+    def dump(self, get_key):
+        """
+        Returns JSON serializable dictionary with the modules of this
+        result, each module replaced by `get_key(mmd)`. The result can be
+        restored by ModulesResolverResult.load. Problems are not dumped.
+
+        :param callable get_key: Returns JSON serializable module key.
+        :rtype: dict
+        """
+        data = {}
+        for attr in ("to_disable", "to_enable", "to_reinstall"):
+            data[attr] = [get_key(mmd) for mmd in getattr(self, attr)]
+        for attr in ("to_downgrade", "to_upgrade"):
+            data[attr] = [[get_key(mmd), get_key(other)]
+                          for mmd, other in getattr(self, attr)]
+        return data
+
+    @classmethod
+    def load(cls, data, key2mmd):
+        """
+        Returns ModulesResolverResult with the modules dumped by dump,
+        or None when some of the modules is not in `key2mmd`.
+
+        :param dict data: Data returned by dump.
+        :param dict key2mmd: Module key -> ModuleMetadata.
+        """
+        result = cls([], [])
+        try:
+            for attr in ("to_disable", "to_enable", "to_reinstall"):
+                setattr(result, attr, [key2mmd[tuple(key)] for key in data[attr]])
+            for attr in ("to_downgrade", "to_upgrade"):
+                setattr(result, attr, [(key2mmd[tuple(key)], key2mmd[tuple(other)])
+                                       for key, other in data[attr]])
+        except (KeyError, TypeError, ValueError):
+            return None
+        return result
 
 
 class ModulesResolver(object):
@@ -143,12 +186,24 @@ class ModulesResolver(object):
         #: libsolv repo for all available modules.
         self.available = self.pool.add_repo("available")
 
-        self._id2mmd = {}
+        #: ModuleMetadata indexed by the id of their Solvable, None for
+        #: the ids of solvables not created from module metadata.
+        self._id2mmd = []
         self._requires_operator = solv.REL_EQ | solv.REL_GT
 
+        #: True when Solvables were added since the whatprovides list
+        #: was generated.
+        self._pool_changed = True
+        #: libsolv Solver reused while the pool does not change.
+        self._solver = None
+        #: (arg, job type) -> list of libsolv Jobs selecting the arg.
+        self._jobs = {}
+
     def set_default_requires_operator(self, strategy):
         """
-        Sets default operator for requirements computing.
+        Sets default operator for requirements computing. The operator
+        applies to the requirements pinning the version of the required
+        stream ("stream:version").
         Possible `strategy` values:
         - "==" - Requirements are treated as the particular version only.
         - ">=" - Requirements are treated as particular version or greater.
@@ -158,6 +213,14 @@ class ModulesResolver(object):
         elif strategy == ">=":
             self._requires_operator = solv.REL_EQ | solv.REL_GT
 
+    def _set_mmd(self, solvable_id, mmd):
+        """
+        Associates the module metadata with the id of its Solvable.
+        """
+        if solvable_id >= len(self._id2mmd):
+            self._id2mmd.extend([None] * (solvable_id + 1 - len(self._id2mmd)))
+        self._id2mmd[solvable_id] = mmd
+
     def _create_solvable(self, repo, mmd):
         """
         Creates libsolv Solvable object from the module metadata and
@@ -175,18 +238,99 @@ class ModulesResolver(object):
         # Provides
         solvable.add_provides(self.pool.Dep(mmd.name).Rel(solv.REL_EQ, self.pool.Dep(solvable.evr)))
         solvable.add_provides(self.pool.Dep(mmd.name).Rel(solv.REL_EQ, self.pool.Dep(None)))
+        # Versioned provide matches also the "module(name:stream)" without
+        # the version.
+        stream_dep = self._get_stream_dep(mmd.name, mmd.stream)
+        solvable.add_provides(stream_dep.Rel(solv.REL_EQ, self.pool.Dep(solvable.evr)))
 
-        # Requires
-        for req_name, version in mmd.requires.items():
+        # Requires, the modulemd requires map the module name to its stream.
+        for req_name, stream in mmd.requires.items():
             # Workaround for broken modulemd parsing...
-            if version == "None":
-                version = None
-            solvable.add_requires(self.pool.Dep(req_name).Rel(self._requires_operator, self.pool.Dep(version)))
-
-        self._id2mmd[solvable] = mmd
+            if not stream or stream == "None":
+                solvable.add_requires(self.pool.Dep(req_name))
+                continue
+            stream, _, version = str(stream).partition(":")
+            dep = self._get_stream_dep(req_name, stream)
+            if version:
+                dep = dep.Rel(self._requires_operator, self.pool.Dep(version))
+            solvable.add_requires(dep)
+
+        self._set_mmd(solvable.id, mmd)
+        self._pool_changed = True
 
         return solvable
 
+    def load_repo(self, repo, mmds, cache_file=None):
+        """
+        Adds Solvables of all the module metadata to the particular repo.
+        When the `cache_file` exists, the repo is read from it by libsolv
+        instead of creating the Solvables one by one, otherwise the repo
+        is written to it for the next time. The `cache_file` therefore has
+        to be unique for the list of `mmds` and the requires operator.
+
+        :param Repo repo: Libsolv repository.
+        :param list mmds: ModuleMetadata instances in stable order.
+        :param string cache_file: Path to the .solv file or None.
+        :return: True when the `cache_file` was written.
+        :rtype: bool
+        """
+        if cache_file and os.path.exists(cache_file):
+            f = solv.xfopen(cache_file)
+            loaded = f is not None and repo.add_solv(f)
+            if f is not None:
+                f.close()
+            # The Solvables are stored in the order they were created, so
+            # they are mapped to the `mmds` only when all of them match.
+            if (loaded and repo.nsolvables == len(mmds)
+                    and all(self._matches(solvable, mmd)
+                            for solvable, mmd in zip(repo.solvables, mmds))):
+                for solvable, mmd in zip(repo.solvables, mmds):
+                    self._set_mmd(solvable.id, mmd)
+                self._pool_changed = True
+                return False
+            repo.empty()
+
+        for mmd in mmds:
+            self._create_solvable(repo, mmd)
+
+        if cache_file:
+            return self._write_repo(repo, cache_file)
+        return False
+
+    @staticmethod
+    def _matches(solvable, mmd):
+        """
+        Returns True when the `solvable` read from a .solv file was created
+        from the module metadata `mmd`.
+        """
+        return solvable.name == mmd.name and solvable.evr == str(mmd.version)
+
+    @staticmethod
+    def _write_repo(repo, cache_file):
+        """
+        Writes the libsolv repo to the .solv `cache_file`. Nothing is written
+        when the cache directory is not writable.
+
+        :return: True when the `cache_file` was written.
+        :rtype: bool
+        """
+        tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(cache_file)):
+                os.makedirs(os.path.dirname(cache_file))
+            f = solv.xfopen(tmp_file, "w")
+            if f is None:
+                return False
+            written = repo.write(f)
+            f.close()
+            if written:
+                os.rename(tmp_file, cache_file)
+            else:
+                os.unlink(tmp_file)
+            return bool(written)
+        except (IOError, OSError):
+            return False
+
     def add_enabled_mmd(self, mmd):
         """
         Adds Module Metadata of enabled (installed) module.
@@ -203,28 +347,87 @@ class ModulesResolver(object):
         """
         self._create_solvable(self.available, mmd)
 
-    def _solve(self, arg, job_type, solutions = []):
+    def _get_stream_dep(self, name, stream):
         """
-        Executes libsolv job, also applying the passed solution list.
-
-        :param string arg: Argument to pass to libsolv (usually module name)
+        Returns libsolv Dep "module(name:stream)" provided by all the
+        versions of the module's stream.
         """
+        return self.pool.Dep("module({}:{})".format(name, stream))
 
-        # Generate the whatprovides list.
-        self.pool.createwhatprovides()
+    def select(self, arg):
+        """
+        Returns libsolv Selection of the modules matching the `arg`.
+        The `arg` in the "name:stream[:version]" form selects the modules
+        of the particular stream directly through the whatprovides index
+        of their "module(name:stream)" provides.
 
-        # Create the solver.
-        solver = self.pool.Solver()
+        :param string arg: Argument to pass to libsolv (usually module name)
+        """
+        if ":" in arg:
+            parts = arg.split(":", 2)
+            dep = self._get_stream_dep(parts[0], parts[1])
+            if len(parts) == 3 and parts[2]:
+                dep = dep.Rel(solv.REL_EQ, self.pool.Dep(parts[2]))
+            sel = self.pool.Selection()
+            if self.pool.whatprovides(dep):
+                sel.add_raw(solv.Job.SOLVER_SOLVABLE_PROVIDES, dep.id)
+            return sel
 
-        # Try to select the module we are interested in.
         flags = solv.Selection.SELECTION_NAME|solv.Selection.SELECTION_PROVIDES|solv.Selection.SELECTION_GLOB
         flags |= solv.Selection.SELECTION_CANON|solv.Selection.SELECTION_DOTARCH|solv.Selection.SELECTION_REL
-        sel = self.pool.select(arg, flags)
-        if sel.isempty():
-            return None
+        return self.pool.select(arg, flags)
+
+    def prepare(self):
+        """
+        Prepares the pool for solving. The whatprovides list is generated
+        and the Solver created only when Solvables were added since the
+        last call, so repeated solving of the same pool does not pay for
+        them again.
+
+        :return: libsolv Solver.
+        """
+        if self._pool_changed or self._solver is None:
+            # Generate the whatprovides list.
+            self.pool.createwhatprovides()
+            self._solver = self.pool.Solver()
+            self._jobs = {}
+            self._pool_changed = False
+        return self._solver
+
+    def _get_jobs(self, arg, job_type):
+        """
+        Returns the list of libsolv Jobs of the `job_type` for the modules
+        matching the `arg`, or None when there is no such module.
+        """
+        key = (arg, job_type)
+        if key not in self._jobs:
+            sel = self.select(arg)
+            self._jobs[key] = None if sel.isempty() else sel.jobs(job_type)
+        return self._jobs[key]
+
+    def _solve(self, args, job_type, solutions = []):
+        """
+        Executes libsolv job, also applying the passed solution list.
+        The selections of all the `args` are combined into a single job,
+        so the whole batch is solved at once.
+
+        :param args: Argument to pass to libsolv (usually module name)
+        or the list of such arguments.
+        """
+        if not isinstance(args, (list, tuple)):
+            args = [args]
+
+        solver = self.prepare()
+
+        # Try to select the modules we are interested in.
+        jobs = []
+        for arg in args:
+            arg_jobs = self._get_jobs(arg, job_type)
+            if arg_jobs is None:
+                return None
+            jobs += arg_jobs
 
         # Prepare the job including the solution for problems from previous calls.
-        jobs = sel.jobs(job_type)
         jobs += solutions
 
         # Try to solve the dependencies.
@@ -236,14 +439,15 @@ class ModulesResolver(object):
 
         # In case there are no problems, parse the results and return.
         trans = solver.transaction()
-        del solver
         return ModulesResolverResult(self._id2mmd, problems, trans)
 
     def solve_enable(self, mod_name, solutions = []):
         """
-        Returns the steps which need to be done to enable particular module.
+        Returns the steps which need to be done to enable particular module,
+        or all the modules when `mod_name` is a list.
 
-        :param string mod_name: Name of the module to enable.
+        :param mod_name: Name of the module to enable or list of names,
+        each in the "name" or "name:stream[:version]" form.
         :param list solutions: Solutions which should solve the problems identified
         in the previous call of this method. See ModulesResolverProblem for more info.
         """
@@ -251,9 +455,10 @@ class ModulesResolver(object):
 
     def solve_disable(self, mod_name, solutions = []):
         """
-        Returns the steps which need to be done to disable particular module.
+        Returns the steps which need to be done to disable particular module,
+        or all the modules when `mod_name` is a list.
 
-        :param string mod_name: Name of the module to disable.
+        :param mod_name: Name of the module to disable or list of names.
         :param list solutions: Solutions which should solve the problems identified
         in the previous call of this method. See ModulesResolverProblem for more info.
         """
@@ -261,9 +466,11 @@ class ModulesResolver(object):
 
     def solve_update(self, mod_name, solutions = []):
         """
-        Returns the steps which need to be done to update particular module.
+        Returns the steps which need to be done to update particular module,
+        or all the modules when `mod_name` is a list.
 
-        :param string mod_name: Name of the module to update.
+        :param mod_name: Name of the module to update or list of names,
+        each in the "name" or "name:stream[:version]" form.
         :param list solutions: Solutions which should solve the problems identified
         in the previous call of this method. See ModulesResolverProblem for more info.
         """
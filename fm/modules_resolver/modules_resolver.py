@@ -17,9 +17,26 @@
 # Written by Jan Kaluza
 
 
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
 import fm.exceptions
 from fm.metadata_cache import CachedModuleMetadata
-from fm.modules_resolver import ModulesResolver
+from fm.modules_resolver import ModulesResolver, ModulesResolverResult
+
+
+#: Version of the Solvables layout, part of the .solv cache files key.
+SOLV_CACHE_VERSION = 3
+
+#: Maximum number of threads preparing the modules for enablement.
+APPLY_WORKERS = 4
+
+#: Maximum number of solver runs applying the solutions of problems
+#: before the resolving is given up.
+MAX_SOLVE_ITERATIONS = 16
 
 
 class FmModulesResolver(ModulesResolver):
@@ -34,53 +51,414 @@ class FmModulesResolver(ModulesResolver):
 
         #: Modules object instance
         self.mods = mods
+        self._operator = operator
 
         # Populate the ModulesResolver with the current state of modules
-        # metadata on the system.
-        for name, mod in mods.items():
-            if mod.is_enabled():
-                self.add_enabled_mmd(mod)
-            else:
-                self.add_available_mmd(mod)
-
-        self._original_arg = None
+        # metadata on the system: the enabled repo holds the one enabled
+        # version of each enabled module. The available repo holds all the
+        # streams and versions in the catalog, so it depends only on the
+        # catalog and its .solv file survives enabling and disabling
+        # modules. Both digests include the modules in the order of the
+        # repo, because the cached Solvables are mapped back to them by
+        # their position. The solver treats the enabled copy of a module as
+        # identical to its available one, so only the rest of the catalog
+        # is offered for installation.
+        enabled = [mod for name, mod in mods.items() if mod.is_enabled()]
+        available = list(mods.catalog)
+
+        #: Repo kind -> digest of the modules in the libsolv repo.
+        self._digests = {
+            "enabled": self._get_digest(enabled),
+            "available": self._get_digest(available),
+        }
+        #: ModuleMetadata of the enabled modules.
+        self._enabled_mmds = enabled
+        #: Masks of the enabled streams, of the streams kept by the
+        #: cascade and of the streams disabled in the transaction, see
+        #: _init_cascade.
+        self._enabled_mask = 0
+        self._kept_mask = 0
+        self._removed_mask = 0
+        #: Module key -> ModuleMetadata of all the modules in the pool.
+        self._key2mmd = dict((self._get_key(mmd), mmd) for mmd in available)
+
+        for kind, repo, mmds in (("enabled", self.enabled, enabled),
+                                 ("available", self.available, available)):
+            if self.load_repo(repo, mmds, self._get_solv_cache_file(kind)):
+                self._remove_stale_solv_files(kind)
+
+        self._original_args = []
+        #: Module names of the "name[:stream[:version]]" specs passed
+        #: by the user.
+        self._original_names = set()
         self.action = None
+        #: Module name -> enabled module or None, filled lazily during
+        #: the transaction by _get_enabled_module.
+        self._enabled_modules = {}
+
+    @staticmethod
+    def _get_key(mmd):
+        """
+        Returns the (name, stream, version) key identifying the module.
+        """
+        return (mmd.name, mmd.stream, str(mmd.version))
+
+    def _get_digest(self, mmds):
+        """
+        Returns digest of the catalog fingerprint and the requires operator
+        together with the keys of the `mmds` in their order, so it changes
+        once any of them or their order changes.
+
+        :param list mmds: ModuleMetadata instances.
+        :rtype: string
+        """
+        digest = hashlib.sha1()
+        digest.update(repr((SOLV_CACHE_VERSION, self.mods.catalog.get_fingerprint(),
+                            self._operator)).encode("utf-8"))
+        for mmd in mmds:
+            digest.update(repr(self._get_key(mmd)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _get_solv_cache_file(self, kind):
+        """
+        Returns path to the .solv file of the libsolv repo of the `kind`.
+        The path is keyed by the digest of the repo's modules, so the file
+        is not reused once the repo changes.
+
+        :param string kind: "enabled" or "available".
+        """
+        return os.path.join(self.mods.catalog.get_cache_dir(), "resolver",
+                            "{}.{}.solv".format(kind, self._digests[kind]))
+
+    def _remove_stale_solv_files(self, kind):
+        """
+        Removes the .solv files of the libsolv repo of the `kind` written
+        for other digests than the current one. They cannot be used again
+        once the catalog or the enabled modules changed.
+
+        :param string kind: "enabled" or "available".
+        """
+        current = self._get_solv_cache_file(kind)
+        cache_dir = os.path.dirname(current)
+        try:
+            names = os.listdir(cache_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(cache_dir, name)
+            if (name.startswith(kind + ".") and name.endswith(".solv")
+                    and path != current):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def _get_result_cache_id(self, action, args):
+        """
+        Returns the id under which the result of the resolving job is
+        stored in the catalog's cache directory.
+        """
+        job = hashlib.sha1(repr((action, list(args))).encode("utf-8"))
+        return os.path.join("resolver", job.hexdigest())
+
+    def _get_result_fingerprint(self):
+        """
+        Returns fingerprint of the pool state the cached results are valid
+        for, the enabled set and the available catalog.
+        """
+        return (self._digests["enabled"], self._digests["available"])
+
+    def _load_result(self, action, args):
+        """
+        Returns the stored ModulesResolverResult of the job or None when
+        there is no result stored for the current state of the pool.
+        """
+        data = self.mods.catalog.load_cache_file(
+            "result", self._get_result_cache_id(action, args),
+            self._get_result_fingerprint())
+        if data is None:
+            return None
+        return ModulesResolverResult.load(data, self._key2mmd)
+
+    def _store_result(self, action, args, ret):
+        """
+        Stores the ModulesResolverResult of the job, so the same job
+        resolved against the same pool state is not solved again.
+        """
+        self.mods.catalog.store_cache_file(
+            "result", self._get_result_cache_id(action, args),
+            self._get_result_fingerprint(), ret.dump(self._get_key))
+
+    @staticmethod
+    def _get_selected_modules(modules):
+        """
+        Returns the map of module name -> ModuleMetadata of the `modules`
+        processed in the transaction. The first module of each name wins.
+        """
+        selected = {}
+        for mmd in modules:
+            selected.setdefault(mmd.name, mmd)
+        return selected
+
+    def _get_module(self, mmd):
+        """
+        Returns the module with the same (name, stream, version) key as
+        the `mmd`, or None when there is no such module.
+        """
+        key = self._get_key(mmd)
+        for mod in self.mods.get_modules(mmd.name) or ():
+            if mod.mmd and self._get_key(mod.mmd) == key:
+                return mod
+        return None
+
+    def _get_enabled_module(self, name):
+        """
+        Returns the enabled module `name` or None. The enabled modules
+        are looked up once per name and transaction and kept in memory.
+        """
+        if name not in self._enabled_modules:
+            self._enabled_modules[name] = None
+            for m in self.mods[name]:
+                if m.is_enabled() and self.mods.enabled_cache.is_cached(m):
+                    self._enabled_modules[name] = m
+                    break
+        return self._enabled_modules[name]
+
+    def _init_cascade(self):
+        """
+        Computes the masks of the enabled streams and of the streams kept
+        by the cascade once per transaction, so the enabled cache is not
+        read again for every disabled module. The disabled streams are
+        added to the removed mask by _disable_modules.
+        """
+        closures = self.mods.catalog.closures
+        self._enabled_mask = closures.get_mask((mmd.name, mmd.stream) for mmd in self._enabled_mmds)
+        self._kept_mask = closures.get_mask(self._get_kept_modules())
+        self._removed_mask = 0
+
+    def _get_cascade_disable(self):
+        """
+        Returns ModuleMetadata of the enabled modules which are not needed
+        anymore once the modules disabled in this transaction are disabled:
+        the modules required by the disabled modules, directly or transitively, which were not enabled
+        by the user and are not required by any other enabled module.
+        """
+        closures = self.mods.catalog.closures
+        orphans = closures.get_orphans(self._enabled_mask, self._kept_mask,
+                                       self._removed_mask)
+
+        keys = set(closures.get_keys(orphans))
+        return [mmd for mmd in self._enabled_mmds if (mmd.name, mmd.stream) in keys]
+
+    def _get_kept_modules(self):
+        """
+        Returns the (name, stream) pairs of the enabled modules which must
+        not be disabled by the cascade according to the enabled cache:
+        the modules enabled by the user, the modules with depending modules
+        which are not among the enabled modules of the catalog and the
+        modules missing in the cache.
+        """
+        enabled_names = set(mmd.name for mmd in self._enabled_mmds)
+        kept = []
+        for mmd in self._enabled_mmds:
+            mod = self._get_enabled_module(mmd.name)
+            if mod is None:
+                kept.append((mmd.name, mmd.stream))
+                continue
 
-    def _edit_required_modules(self, mod, processed_modules, edit_fnc):
+            xmd = mod.mmd.xmd or {}
+            if xmd.get(CachedModuleMetadata.ENABLED_BY_USER):
+                kept.append((mmd.name, mmd.stream))
+                continue
+
+            # Dependencies between the enabled modules of the catalog are
+            # followed by the closures, the other ones only by the cache.
+            depending = self.mods.enabled_cache.get_depending_mods(mod)
+            if any(name not in enabled_names for name in depending):
+                kept.append((mmd.name, mmd.stream))
+        return kept
+
+    def _check_conflicts(self, args):
+        """
+        Raises DependencyError when the modules selected by `args` always
+        require different streams of some module, so they can never be
+        enabled together. Modules without a stream in `args` are checked
+        when they have only a single stream.
+        """
+        closures = self.mods.catalog.closures
+        keys = []
+        for arg in args:
+            parts = arg.split(":")
+            if len(parts) > 1:
+                keys.append((parts[0], parts[1]))
+            else:
+                streams = closures.get_keys(closures.name_masks.get(arg, 0))
+                if len(streams) == 1:
+                    keys.append(streams[0])
+
+        conflicts = closures.get_conflicts(closures.get_mask(keys))
+        if conflicts:
+            name = sorted(conflicts)[0]
+            raise fm.exceptions.DependencyError(
+                "Conflicting streams of module {} required: {}".format(
+                    name, ", ".join(conflicts[name])))
+
+    def _edit_required_modules(self, mod, selected_modules, edit_fnc):
         """
         Iterates over the modules required by the processed and enabled
         modules during the modules enablement or disablement and executes
         `edit_fnc(required_module, mod.name)` for all the required modules.
+
+        :param dict selected_modules: Module name -> ModuleMetadata of the
+            processed modules, see _get_selected_modules.
         """
         for required_mod_name, version in mod.mmd.requires.items():
             required_mod = None
 
             # Try to find out the particular version of the depending
             # module we are going to enable together with this one.
-            for mmd in processed_modules:
-                if mmd.name == required_mod_name:
-                    required_mod = self.mods.get_modules(mmd.name, mmd.version, mmd.release)[0]
-                    break
+            mmd = selected_modules.get(required_mod_name)
+            if mmd is not None:
+                required_mod = self._get_module(mmd)
 
             # If we did not find module in previous step, it means
             # that this module is already enabled on the system, so
             # try to find it out in the list of enabled modules.
             if not required_mod:
-                for m in self.mods[required_mod_name]:
-                    if m.is_enabled() and self.mods.enabled_cache.is_cached(m):
-                        required_mod = m
-                        break
+                required_mod = self._get_enabled_module(required_mod_name)
 
             if not required_mod:
                 raise fm.exceptions.DependencyError("Dependency on module {} is not satisfied.".format(required_mod_name))
 
             edit_fnc(required_mod, mod.name)
 
-    def _enable_modules(self, modules, no_dnf = None, profiles = ["default"]):
+    @staticmethod
+    def _get_dependency_levels(modules):
+        """
+        Splits the `modules` into levels in topological order: modules of
+        each level require only the modules of the previous levels, so the
+        modules in one level do not depend on each other. Modules in
+        a dependency cycle are put in the last level.
+
+        :param list modules: ModuleMetadata instances.
+        :return: List of lists of ModuleMetadata.
+        """
+        index = dict((mmd.name, i) for i, mmd in enumerate(modules))
+        pending = [0] * len(modules)
+        dependents = [[] for _ in modules]
+        for i, mmd in enumerate(modules):
+            for name in mmd.requires:
+                dep = index.get(name)
+                if dep is not None and dep != i:
+                    pending[i] += 1
+                    dependents[dep].append(i)
+
+        levels = []
+        level = [i for i in range(len(modules)) if pending[i] == 0]
+        done = 0
+        while level:
+            levels.append([modules[i] for i in level])
+            done += len(level)
+            next_level = []
+            for i in level:
+                for j in dependents[i]:
+                    pending[j] -= 1
+                    if pending[j] == 0:
+                        next_level.append(j)
+            level = sorted(next_level)
+
+        if done != len(modules):
+            levels.append([mmd for i, mmd in enumerate(modules) if pending[i] > 0])
+        return levels
+
+    def _prepare_modules(self, modules, no_dnf):
+        """
+        Prepares the `modules` for enablement concurrently, see
+        Module.prepare. When some module fails, the repo files of the
+        modules prepared by this call are removed and the first error is
+        raised.
+
+        :return: List of the prepared Module instances.
+        """
+        # Missing modules are reported before anything is prepared.
+        mods = []
+        for mmd in modules:
+            if not mmd.name in self.mods:
+                raise fm.exceptions.DependencyError("Dependency on module {} is not satisfied.".format(mmd.name))
+            mod = self._get_module(mmd)
+            if mod is None:
+                raise fm.exceptions.DependencyError("There is no module named {}".format(mmd.name))
+            mods.append(mod)
+
+        def prepare(mod):
+            try:
+                mod.prepare(not no_dnf)
+            except Exception as err:
+                return err
+            return None
+
+        if len(mods) < 2:
+            errors = [prepare(mod) for mod in mods]
+        else:
+            pool = ThreadPool(min(APPLY_WORKERS, len(mods)))
+            try:
+                errors = pool.map(prepare, mods)
+            finally:
+                pool.close()
+                pool.join()
+
+        prepared = [mod for mod, err in zip(mods, errors) if err is None]
+        for err in errors:
+            if err is not None:
+                self._remove_repo_files(prepared)
+                raise err
+        return prepared
+
+    @staticmethod
+    def _remove_repo_files(mods):
+        """
+        Removes the repo files of the prepared `mods` when their
+        enablement cannot be finished. Errors are ignored, so the original
+        error is the one reported.
+        """
+        for mod in mods:
+            try:
+                mod.repo_file.remove()
+            except fm.exceptions.Error:
+                pass
+
+    def _install_profile_rpms(self, modules, profiles):
+        """
+        Marks the RPMs of the `profiles` of all the `modules` for
+        installation. The RPMs are collected per module repository first
+        and each repository's RPMs are marked by a single DNF call.
+
+        :raises fm.exceptions.Error: If DNF cannot mark some RPMs.
+        """
+        by_repo = OrderedDict()
+        for mmd in modules:
+            mod = self._get_module(mmd)
+            if mod is None:
+                continue
+            _, rpms, seen = by_repo.setdefault(mod.name, (mod, [], set()))
+            for rpm in mod.get_profile_rpms(profiles):
+                if rpm not in seen:
+                    seen.add(rpm)
+                    rpms.append(rpm)
+
+        for mod, rpms, _ in by_repo.values():
+            mod.install_rpms(rpms)
+
+    def _enable_modules(self, modules, no_dnf = None, profiles = ["default"],
+                        prepared = False):
         """
         Enables the modules defined by the `modules` list.
+
+        :param bool prepared: True if the modules were prepared already by
+            _prepare_modules.
         """
 
+        selected = self._get_selected_modules(modules)
         for mmd in modules:
             name = mmd.name
             # Check if we have some metadata for this module.
@@ -88,139 +466,216 @@ class FmModulesResolver(ModulesResolver):
                 raise fm.exceptions.DependencyError("Dependency on module {} is not satisfied.".format(name))
 
             # Get the Module instance for this ModuleMetadata object.
-            mods = self.mods.get_modules(mmd.name, mmd.version, mmd.release)
-            if not mods:
+            mod = self._get_module(mmd)
+            if mod is None:
                 raise fm.exceptions.DependencyError("There is no module named {}".format(name))
 
-            mod = mods[0]
             if not mod.mmd:
                 raise fm.exceptions.DependencyError("There is no metadata associated with module {}".format(name))
 
-            print("Enabling module", name + "-" + mod.mmd.version + "-" + mod.mmd.release)
+            print("Enabling module", mod.mmd.get_nvr())
 
             # Enable current module.
             if no_dnf == None:
                 no_dnf = self.mods.opts.no_dnf
-            mod.enable(profiles, not no_dnf)
+            mod.enable(profiles, not no_dnf, prepared)
 
             # Add this module as depending module for all the modules
             # this one required.
             if mod.mmd.requires:
-                self._edit_required_modules(mod, modules,
+                self._edit_required_modules(mod, selected,
                                             self.mods.enabled_cache.add_depending_mod)
 
             # Add this module to cache of enabled modules.
             self.mods.enabled_cache.store(mod,
-                                          enabled_by_user = mod.name == self._original_arg)
+                                          enabled_by_user = mod.name in self._original_names)
+            self._enabled_modules[mod.name] = mod
 
-    def _disable_modules(self, modules, no_dnf = None):
+    def _disable_modules(self, modules, no_dnf = None, cascade = True,
+                         replaced = False):
         """
         Disables the modules defined by the `modules` list.
+
+        :param bool cascade: When disabling, disable also the modules
+            which are not needed anymore, see _get_cascade_disable.
+        :param bool replaced: True if the modules are replaced by their
+            prepared upgrade or downgrade targets, so only the caches are
+            updated and their packages and repo files are kept.
         """
 
+        selected = self._get_selected_modules(modules)
         for mmd in modules:
             name = mmd.name
             # Get the Module instance for this ModuleMetadata object.
-            mods = self.mods.get_modules(mmd.name, mmd.version, mmd.release)
-            if not mods:
+            mod = self._get_module(mmd)
+            if mod is None:
                 raise fm.exceptions.DependencyError("There is no module named {}".format(name))
 
-            mod = mods[0]
             if not mod.mmd:
                 raise fm.exceptions.DependencyError("There is no metadata associated with module {}".format(name))
 
             if not mod.is_enabled():
                 continue
 
-            print("Disabling module", name + "-" + mod.mmd.version + "-" + mod.mmd.release)
+            print("Disabling module", mod.mmd.get_nvr())
 
             # Now when all the depending modules are disabled, disable also
             # the original module.
             if no_dnf == None:
                 no_dnf = self.mods.opts.no_dnf
-            mod.disable(not no_dnf)
+            if not replaced:
+                mod.disable(not no_dnf)
 
             # Remove this module as depending module for all the modules
             # this one required.
-            self._edit_required_modules(mod, modules,
+            self._edit_required_modules(mod, selected,
                                         self.mods.enabled_cache.remove_depending_mod)
 
+            self._removed_mask |= self.mods.catalog.closures.get_mask(
+                [(mod.mmd.name, mod.mmd.stream)])
+
             # Disable all modules this one required when they have not been enabled
             # by the user and there are no dependencies on them.
-            def _disable_modules_wrapper(mod, name):
-                if ((CachedModuleMetadata.ENABLED_BY_USER in mod.mmd.xmd
-                        and mod.mmd.xmd[CachedModuleMetadata.ENABLED_BY_USER])):
-                    return
-                if len(self.mods.enabled_cache.get_depending_mods(mod)) != 0:
-                    return
-                self._disable_modules([mod.mmd])
-            if self.action == "disable":
-                self._edit_required_modules(mod, modules, _disable_modules_wrapper)
+            if self.action == "disable" and cascade:
+                orphans = self._get_cascade_disable()
+                if orphans:
+                    self._disable_modules(orphans, cascade = False)
 
             self.mods.enabled_cache.remove(mod)
+            self._enabled_modules.pop(mod.name, None)
 
-    def _upgrade_modules(self, modules, no_dnf = None, profiles = ["default"]):
+    def _upgrade_modules(self, modules, no_dnf = None):
         """
-        Upgrades the modules defined by the `modules` list to latest version.
+        Upgrades the packages of the modules defined by the `modules` list
+        of (from, to) ModuleMetadata pairs. The `to` modules have to be
+        enabled already.
         """
+        if no_dnf == None:
+            no_dnf = self.mods.opts.no_dnf
+        for _, to_mmd in modules:
+            self._get_module(to_mmd).upgrade(not no_dnf)
 
-        for from_mmd, to_mmd in modules:
-            name = from_mmd.name
-            print("Upgrading module",
-                  name + "-" + from_mmd.version + "-" + from_mmd.release,
-                  "to", name + "-" + to_mmd.version + "-" + to_mmd.release)
-
-            self._disable_modules([from_mmd], True)
+    def _restore_repo_files(self, modules):
+        """
+        Creates again the repo files of the enabled `modules` whose upgrade
+        or downgrade targets were prepared, the targets share the repo file
+        with them. Errors are ignored, so the original error is the one
+        reported.
+        """
+        for mmd in modules:
+            mod = self._get_module(mmd)
             try:
-                self._enable_modules([to_mmd], profiles = profiles)
-            except:
-                self._enable_modules([from_mmd], True, profiles = profiles)
-                raise
-            mod = self.mods.get_modules(to_mmd.name, to_mmd.version, to_mmd.release)[0]
-            mod.upgrade(not self.mods.opts.no_dnf)
+                mod.repo_file.create()
+            except fm.exceptions.Error:
+                pass
 
     def _apply_result(self, ret, profiles = ["default"]):
         """
         Applies the results of the resolving - enables, disables, upgrades or
         downgrades the modules according to the resolving result.
         """
-        self._enable_modules(ret.to_enable, profiles = profiles)
+        self._enabled_modules = {}
+        if self.action == "disable" and ret.to_disable:
+            self._init_cascade()
+
+        # Modules of each level, including the upgrade and downgrade
+        # targets, are prepared concurrently and the packages of all of them
+        # are marked at once. Nothing is stored in the enabled cache until
+        # that succeeded, a failure removes the repo files of all the
+        # modules prepared so far and restores the ones of the upgraded
+        # modules. The caches are then updated in the dependency order.
+        no_dnf = self.mods.opts.no_dnf
+        upgrades = ret.to_upgrade + ret.to_downgrade
+        targets = ret.to_enable + [to_mmd for _, to_mmd in upgrades]
+        levels = self._get_dependency_levels(targets)
+        prepared = []
+        try:
+            for level in levels:
+                prepared += self._prepare_modules(level, no_dnf)
+            if not no_dnf:
+                self._install_profile_rpms(targets, profiles)
+        except Exception:
+            self._remove_repo_files(prepared)
+            self._restore_repo_files([from_mmd for from_mmd, _ in upgrades])
+            raise
+
+        for from_mmd, to_mmd in upgrades:
+            print("Upgrading module", from_mmd.get_nvr(), "to", to_mmd.get_nvr())
+            self._disable_modules([from_mmd], True, cascade = False, replaced = True)
+        for level in levels:
+            self._enable_modules(level, True, profiles, prepared = True)
+
         self._disable_modules(ret.to_disable)
-        self._upgrade_modules(ret.to_upgrade, profiles = profiles)
-        self._upgrade_modules(ret.to_downgrade, profiles = profiles)
+        self._upgrade_modules(upgrades)
         if fm.api_clients.DNFBASE.dnfbase.sack \
                 and not fm.api_clients.DNFBASE.pluginbase:
             fm.api_clients.DNFBASE.transaction_run()
 
-    def execute(self, action, arg, profiles = ["default"]):
+    def execute(self, action, args, profiles = ["default"]):
         """
         Executes the resolving action and applies the results. When this
         method returns, the `action` should be performed and modules should
         be enabled, disabled or upgraded accordingly. This method can ask
         users questions and expect input from stdin.
+
+        The `args` can be a single module spec or a list of them. All the
+        modules in the list are resolved by a single solver job and the
+        combined result is applied at once.
+        """
+        ret = self.resolve(action, args)
+        self._apply_result(ret, profiles)
+
+    def resolve(self, action, args):
+        """
+        Resolves the `action` for the `args` module specs, applying the
+        first solution of each problem until there are no problems left,
+        but does not apply the result. See execute for the arguments.
+        The result is stored in the cache directory and replayed without
+        running libsolv while the enabled set and the catalog do not change.
+
+        :return: ModulesResolverResult without problems.
         """
-        self._original_arg = arg
+        if not isinstance(args, (list, tuple)):
+            args = [args]
+        self._original_args = args
+        self._original_names = set(arg.split(":", 1)[0] for arg in args)
         self.action = action
 
+        ret = self._load_result(action, args)
+        if ret is not None:
+            return ret
+
+        if action == "enable":
+            self._check_conflicts(args)
+
         #: List of resolving solutions when some problem appears.
         solutions = []
 
+        start = time.time()
+        iterations = 0
         while True: 
+            iterations += 1
             if action == "enable":
-                ret = self.solve_enable(arg, solutions)
+                ret = self.solve_enable(args, solutions)
             elif action == "disable":
-                ret = self.solve_disable(arg, solutions)
+                ret = self.solve_disable(args, solutions)
             elif action == "upgrade":
-                ret = self.solve_update(arg, solutions)
+                ret = self.solve_update(args, solutions)
             else:
                 raise fm.exceptions.DependencyError("Unknown internal solvable action: " + action)
 
             if not ret:
-                raise fm.exceptions.DependencyError("No such module: " + arg)
+                missing = [arg for arg in args if self.select(arg).isempty()]
+                raise fm.exceptions.DependencyError("No such module: " + ", ".join(missing))
 
             if len(ret.problems) == 0:
                 break
 
+            if iterations >= MAX_SOLVE_ITERATIONS:
+                raise fm.exceptions.DependencyError(
+                    "Dependencies not resolved in {} iterations: {}".format(
+                        iterations, ret.problems[0].desc))
+
             #TODO: This should be forced by -y argument, by default we should
             # ask user.
             solution_size = len(solutions)
@@ -232,4 +687,9 @@ class FmModulesResolver(ModulesResolver):
             if solution_size == len(solutions):
                 raise fm.exceptions.DependencyError(ret.problems[0].desc)
 
-        self._apply_result(ret, profiles)
+        if iterations > 1:
+            print("Dependencies resolved in {} iterations, {:.2f} ms".format(
+                iterations, (time.time() - start) * 1000))
+
+        self._store_result(action, args, ret)
+        return ret
@@ -0,0 +1,117 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""
+Reverse index from RPM names to the modules shipping them.
+"""
+
+from __future__ import print_function
+
+#: Role of RPM listed in the module's API.
+ROLE_API = "api"
+#: Role of RPM filtered out of the module.
+ROLE_FILTER = "filter"
+#: Role of RPM built as the module's component.
+ROLE_COMPONENT = "component"
+#: Prefix of the role of RPM installed by a module's profile.
+ROLE_PROFILE_PREFIX = "profile:"
+
+
+def get_module_rpms(mmd):
+    """
+    Generates (rpm name, role) tuples of all the RPMs referenced by the
+    module metadata.
+
+    :param ModuleMetadata mmd: Module metadata.
+    """
+    for profile_name, profile in sorted(mmd.profiles.items()):
+        for rpm in sorted(profile.rpms):
+            yield rpm, ROLE_PROFILE_PREFIX + profile_name
+
+    for rpm in sorted(mmd.api.rpms):
+        yield rpm, ROLE_API
+
+    for rpm in sorted(mmd.filter.rpms):
+        yield rpm, ROLE_FILTER
+
+    if mmd.components:
+        for rpm in sorted(mmd.components.rpms):
+            yield rpm, ROLE_COMPONENT
+
+
+class RPMIndex(object):
+    """
+    Maps RPM name to the list of (module name, stream, version, role)
+    tuples. The index is a plain dictionary of lists so it can be stored
+    as JSON in the cache directory.
+    """
+
+    def __init__(self, rpms=None):
+        """
+        Creates new RPMIndex instance.
+
+        :param dict rpms: RPM name -> list of (name, stream, version, role).
+        """
+        #: RPM name -> list of (module name, stream, version, role).
+        self.rpms = rpms if rpms is not None else {}
+
+    @classmethod
+    def from_modules(cls, modules):
+        """
+        Creates new RPMIndex of the RPMs referenced by the `modules`.
+
+        :param iterable modules: ModuleMetadata instances.
+        :rtype: RPMIndex
+        """
+        index = cls()
+        for mmd in modules:
+            for rpm, role in get_module_rpms(mmd):
+                index.rpms.setdefault(rpm, []).append(
+                    (mmd.name, mmd.stream, mmd.version, role))
+        return index
+
+    @classmethod
+    def merge(cls, datas):
+        """
+        Creates new RPMIndex from the index data of multiple repos.
+
+        :param list datas: RPM name -> list of entries dictionaries.
+        :rtype: RPMIndex
+        """
+        index = cls()
+        for data in datas:
+            index.update(cls(data))
+        return index
+
+    def update(self, other):
+        """
+        Adds the entries of the `other` RPMIndex to this one.
+        """
+        for rpm, entries in other.rpms.items():
+            self.rpms.setdefault(rpm, []).extend(entries)
+
+    def lookup(self, rpm):
+        """
+        Returns the list of (module name, stream, version, role) tuples
+        of modules shipping the `rpm`.
+
+        :rtype: list
+        """
+        return [tuple(entry) for entry in self.rpms.get(rpm, [])]
+
+    def __len__(self):
+        return len(self.rpms)
@@ -19,11 +19,150 @@
 
 from __future__ import print_function
 
+import bisect
 import fnmatch
+import functools
 import re
+import time
 
 import fm.exceptions
 import fm.modules
+from fm.modules_index import compare, tokenize, version_key
+
+
+#: Characters making a name pattern a wildcard pattern.
+WILDCARD_CHARS = "*?["
+
+
+class NameQuery(object):
+    """
+    Compiled --name patterns. Literal names are matched by a set lookup,
+    all the wildcard patterns are combined into a single regular
+    expression, compiled once per query.
+    """
+
+    def __init__(self, patterns):
+        """
+        Creates new NameQuery instance.
+
+        :param list patterns: Module names, possibly with wildcards.
+        """
+        #: Set of names without wildcards.
+        self.literals = set()
+        #: Literal prefixes of the wildcard patterns.
+        self.prefixes = set()
+        wildcards = []
+
+        for pattern in patterns:
+            pos = min([pattern.find(c) for c in WILDCARD_CHARS if c in pattern] or [-1])
+            if pos == -1:
+                self.literals.add(pattern)
+            else:
+                self.prefixes.add(pattern[:pos])
+                wildcards.append(fnmatch.translate(pattern))
+
+        #: Combined regular expression of all wildcard patterns or None.
+        self.regex = None
+        if wildcards:
+            self.regex = re.compile("|".join("(?:{})".format(w) for w in wildcards))
+
+    def match(self, name):
+        """
+        Returns True if the `name` matches any of the patterns.
+        """
+        if name in self.literals:
+            return True
+        return self.regex is not None and self.regex.match(name) is not None
+
+    def candidates(self, sorted_names):
+        """
+        Generates names from the `sorted_names` which can match a wildcard
+        pattern: only the ranges starting with the patterns' literal
+        prefixes are visited.
+
+        :param list sorted_names: Sorted list of module names.
+        """
+        if "" in self.prefixes:
+            for name in sorted_names:
+                yield name
+            return
+
+        # Skip the prefixes covered by other shorter prefixes.
+        last = None
+        for prefix in sorted(self.prefixes):
+            if last is not None and prefix.startswith(last):
+                continue
+            last = prefix
+            start = bisect.bisect_left(sorted_names, prefix)
+            for name in sorted_names[start:]:
+                if not name.startswith(prefix):
+                    break
+                yield name
+
+    def estimate(self, index):
+        """
+        Returns upper bound of the number of modules in the ModulesIndex
+        with a matching name.
+        """
+        if "" in self.prefixes:
+            return len(index.modules)
+
+        count = sum(len(index.lookup("name", name)) for name in self.literals)
+        if self.regex is not None:
+            name_postings = index.postings["name"]
+            count += sum(len(name_postings[name])
+                         for name in self.candidates(index.sorted_names))
+        return min(count, len(index.modules))
+
+    def filter(self, index):
+        """
+        Returns ids of modules in the ModulesIndex with a matching name.
+
+        :rtype: set
+        """
+        ids = set()
+        for name in self.literals:
+            ids |= index.lookup("name", name)
+
+        if self.regex is not None:
+            name_postings = index.postings["name"]
+            for name in self.candidates(index.sorted_names):
+                if self.regex.match(name):
+                    ids |= name_postings[name]
+        return ids
+
+
+class SearchStep(object):
+    """
+    Single predicate of the search plan.
+    """
+
+    def __init__(self, desc, estimate, evaluate, match):
+        """
+        Creates new SearchStep instance.
+
+        :param string desc: User-level description of the predicate.
+        :param int estimate: Estimated number of matching modules.
+        :param callable evaluate: Function returning the set of matching
+            module ids from the set of candidate ids, or from all the
+            modules when the candidates are None.
+        :param callable match: Function returning True when the module
+            with the given id matches the predicate.
+        """
+        self.desc = desc
+        self.estimate = estimate
+        self.evaluate = evaluate
+        self.match = match
+        #: Number of module ids which passed this step, None when skipped.
+        self.count = None
+        #: Time spent evaluating this step in seconds.
+        self.time = 0.0
+
+    def __str__(self):
+        if self.count is None:
+            return "{}: estimated {}, skipped".format(self.desc, self.estimate)
+        return "{}: estimated {}, matched {}, {:.3f} ms".format(
+            self.desc, self.estimate, self.count, self.time * 1000)
 
 
 class ModulesSearch(object):
@@ -31,6 +170,14 @@ class ModulesSearch(object):
     Searches for modules from Modules instance.
     """
 
+    #: Keywords matched only by looking up the inverted index:
+    #: keyword -> (indexed field, whether all the tokens have to match).
+    INDEXED_KEYWORDS = {
+        "_license": ("license", False),
+        "_summary": ("summary", True),
+        "_description": ("description", True),
+    }
+
     def __init__(self, mods):
         """
         Creates new ModulesSearch instance.
@@ -39,6 +186,10 @@ class ModulesSearch(object):
         """
         #: Modules
         self.mods = mods
+        #: ModulesIndex of the catalog the modules are loaded from.
+        self.index = mods.catalog.index
+        #: List of SearchStep instances of the last search.
+        self.last_plan = []
 
     def search(self, keywords):
         """
@@ -49,238 +200,263 @@ class ModulesSearch(object):
         """
 
         matching = fm.modules.Modules(self.mods.cfg, self.mods.opts)
-
-        if len(keywords) == 0:
-            return matching
- 
-        # STEP 1: Gather a list of modules
-        # If '_name' in dict, let's keep it simple so that the next step
-        # is faster...
-        modules = self._gather_modules(keywords)
-
-        # STEP 2: Let's search through 'modules' to find the module that meets
-        #         our full search criteria.
-        results = []
- 
-        version_exists = False
-        release_exists = False
-        
-        if "_version" in keywords:
-            version_exists = True
-
-        if "_release" in keywords:
-            release_exists = True
-
-        # Start with iterating through the entire module list and get all
-        # the module metadata keys (e.g., _name, _release, etc.)
-        for module in modules:
-            metadata_names = vars(module.mmd)
-            matches = True
-
-            # For each module in the list of modules, we find where the metadata
-            # completely meets our full criteria. The 'matches' boolean variable
-            # tells us if any of the criteria is not met.
-            for key in metadata_names.keys():
-                if key not in keywords:
-                    continue
-            
-                    if version_exists == True and key == "_version":
-                        continue
-                    elif release_exists == True and key == "_release":
-                        continue
-                    else:
-                        if key == "_requires":
-                            if metadata_names[key] != keywords[key]:
-                                matches = False
-                                break
-                        elif metadata_names[key] not in keywords[key]:
-                            matches = False
-                            break
-  
-            # If the criteria is 100% met for the given module, add it to the
-            # resulting list of modules
-            if matches and module not in results:
-                results.append(module)
-        
-
-        # STEP 4: Add the resulting modules to 'matching' and pass 'matching'
-        #         back to cli.py so that we can get a brief description
-        #         of each module and print it out to the command line.
-        for item in results:
-            matching.add_module(item, False)
+        for mmd in self.iter_search(keywords):
+            matching.add_module(mmd, False)
         return matching
 
-    def _gather_modules(self, keywords):
-        '''
-        Returns a list of modules for a given keywords dictionary
+    def iter_search(self, keywords):
+        """
+        Generates ModuleMetadata matching the keywords in the catalog order.
+        Only the most selective step of the search plan is evaluated up
+        front, the rest of the steps are checked for its candidates one by
+        one, so the caller can stop after the first few matches. The plan
+        of the search is kept in `last_plan`.
+
+        :param dictionary keywords: Dictionary of keywords to search for.
+        """
+        if len(keywords) == 0:
+            return
+
+        self.last_plan = self.plan(keywords)
+        if not self.last_plan:
+            for mmd in self.index.modules:
+                yield mmd
+            return
+
+        first, rest = self.last_plan[0], self.last_plan[1:]
+        start = time.time()
+        ids = first.evaluate(None)
+        first.time = time.time() - start
+        first.count = len(ids)
+        # Nothing can match anymore, skip the rest of the plan.
+        if not ids:
+            return
+
+        for step in rest:
+            step.count = 0
+        for mid in sorted(ids):
+            if self._match_steps(rest, mid):
+                yield self.index.modules[mid]
+
+    def plan(self, keywords):
+        """
+        Returns the list of SearchStep instances evaluating the keywords,
+        ordered from the most selective one. The selectivity is estimated
+        from the sizes of the posting lists and sorted version indexes.
 
         :param keywords: Dictionary of keywords to search for
-        '''
-        modules = []
-
-        #Parse 'version' and/or 'release'  first because they're most difficult to deal with
-        if "_version" in keywords:
-            modules = self._parse_version_or_release(keywords, "_version")
-            wildcards = self._check_for_wildcards_in_name(keywords)
-
-            if "_release" in keywords:
-                tmp = []
-                release = keywords["_release"][1]
-                inequality = keywords["_release"][0]
-                for mod in modules:
-                    mmd = mod.mmd.release
-                    tmp = self._get_modules_by_inequality("_release", inequality, release, tmp, mod)
-                modules = tmp
-            
-            if wildcards == True:
-                self._parse_name(keywords, modules)
-                
-
-        elif "_release" in keywords:
-            modules = self._parse_version_or_release(keywords, "_release")
-            wildcards = self._check_for_wildcards_in_name(keywords)
-            if wildcards == True:
-                self._parse_name(keywords, modules)
-
-        elif "_name" in keywords:
-            modules = self._parse_name(keywords, [])
-
-        else:
-            for name, mods in self.mods.items():
-                for mod in mods:
-                    modules.append(mod)
-
-        return modules
-
-
-    def _parse_name(self, keywords, modules=[]):
-        """
-        Parse the name for each module in the entire database
-        
-        :param keywords: dictionary of keywords to search for
+        :rtype: list
         """
-        if not modules:
-            module_names = keywords["_name"] 
-
-            for mod_name in module_names:
+        steps = []
+        # The name patterns are compiled once and shared by all the steps.
+        query = None
+        if "_name" in keywords:
+            query = NameQuery(keywords["_name"])
+            steps.append(SearchStep(
+                "name {}".format(keywords["_name"]),
+                query.estimate(self.index),
+                functools.partial(self._evaluate_name, query),
+                functools.partial(self._match_name, query)))
+
+        for keyword, (field, match_all) in sorted(self.INDEXED_KEYWORDS.items()):
+            if keyword not in keywords:
+                continue
+            values = keywords[keyword]
+            if match_all:
+                tokens = tokenize(" ".join(values))
+                estimate = self.index.estimate_all(field, tokens)
+            else:
+                tokens = values
+                estimate = self.index.estimate_any(field, tokens)
+            steps.append(SearchStep(
+                "{} {}".format(field, values), estimate,
+                functools.partial(self._evaluate_indexed, field, tokens, match_all),
+                functools.partial(self._match_indexed, field, tokens, match_all)))
+
+        if "_requires" in keywords:
+            tokens = self._get_requires_tokens(keywords)
+            steps.append(SearchStep(
+                "requires {}".format(tokens),
+                self.index.estimate_all("requires", tokens),
+                functools.partial(self._evaluate_requires, keywords),
+                functools.partial(self._match_indexed, "requires", tokens, True)))
+
+        for keyword in ("_version", "_release"):
+            if keyword not in keywords:
+                continue
+            inequality, value = keywords[keyword][0], keywords[keyword][1]
+            # The release is called stream in the module metadata.
+            field = "version" if keyword == "_version" else "stream"
+            reobj = None
+            names = None
+            if any(c in value for c in WILDCARD_CHARS):
+                reobj = re.compile(fnmatch.translate(value))
+                estimate = len(self.index.modules)
+                match = functools.partial(self._get_modules_by_inequality, field,
+                                          inequality, reobj)
+            else:
+                names = self._get_literal_names(query)
+                estimate = self.index.estimate_inequality(field, inequality, value, names)
+                match = functools.partial(self._match_inequality, field, inequality,
+                                          version_key(value), names)
+            steps.append(SearchStep(
+                "{} {} {}".format(field, inequality, value), estimate,
+                functools.partial(self._parse_version_or_release, field,
+                                  inequality, value, reobj, names),
+                match))
+
+        # Sorting is stable, so equally selective steps keep the cheaper
+        # index lookups first.
+        steps.sort(key=lambda step: step.estimate)
+        return steps
+
+    @staticmethod
+    def _match_steps(steps, mid):
+        """
+        Checks the module with id `mid` against the `steps` in their order,
+        stopping at the first one it does not match. The number of passed
+        modules and the time spent are added to each checked step.
 
-                for name, mods in self.mods.items():
-                    if mod_name == name:
-                        modules.extend(mods)
+        :return: True if the module matches all the steps.
+        """
+        for step in steps:
+            start = time.time()
+            matched = step.match(mid)
+            step.time += time.time() - start
+            if not matched:
+                return False
+            step.count += 1
+        return True
+
+    def _evaluate_name(self, query, ids):
+        """
+        Narrows the candidate `ids` to modules matching the names of the
+        NameQuery.
+        """
+        return self._narrow(ids, query.filter(self.index))
 
-                    #Handle wildcards using regex to find matching names. For any name match,
-                    #append the matching name to the end of 'module_names' so that it gets
-                    #parsed
-                    elif "*" in mod_name:
-                        name_regex = fnmatch.translate(mod_name)
-                        reobj = re.compile(name_regex)
-                        matches = [m.group(0) for mod in mods for m in [reobj.search(mod.name)] if m]
-                        for match in matches:
-                            if (match not in module_names):
-                                module_names.append(match)
+    def _evaluate_indexed(self, field, tokens, match_all, ids):
+        """
+        Narrows the candidate `ids` to modules having all or any of the
+        `tokens` in the indexed `field`.
+        """
+        if match_all:
+            return self._narrow(ids, self.index.match_all(field, tokens))
+        return self._narrow(ids, self.index.match_any(field, tokens))
 
-        else:
-            module_names = keywords["_name"]
-            tmp = []
+    def _match_name(self, query, mid):
+        """
+        Checks whether the name of module with id `mid` matches the
+        NameQuery.
+        """
+        return query.match(self.index.modules[mid].name)
 
-            for mod in modules:
-                name = mod.name
+    def _match_indexed(self, field, tokens, match_all, mid):
+        """
+        Checks whether module with id `mid` has all or any of the `tokens`
+        in the indexed `field`.
+        """
+        found = (mid in self.index.lookup(field, token) for token in tokens)
+        if match_all:
+            return all(found)
+        return any(found)
 
-                for mod_name in module_names:
-                    if mod_name == name:
-                        tmp.append(mod)
+    def _match_inequality(self, field, inequality, key, names, mid):
+        """
+        Checks the `inequality` of the `field` of module with id `mid` and
+        the version `key`, only for modules called one of `names` when they
+        are not None.
+        """
+        if names is not None and self.index.modules[mid].name not in names:
+            return False
+        return compare(inequality, self.index.get_value_keys(field)[mid], key)
 
-                    elif "*" in mod_name:
-                        name_regex = fnmatch.translate(mod_name)
-                        reobj = re.compile(name_regex)
-                        matches = [m.group(0) for module in modules for m in [reobj.search(module.name)] if m]
-                        for match in matches:
-                            if (match not in module_names):
-                                module_names.append(match)
-            modules = tmp
+    def _evaluate_requires(self, keywords, ids):
+        """
+        Narrows the candidate `ids` to modules with the requirements.
+        """
+        return self._narrow(ids, self._parse_requires(keywords))
 
-        return modules
+    @staticmethod
+    def _narrow(ids, found):
+        """
+        Intersects the current candidate `ids` with the `found` ones.
+        """
+        if ids is None:
+            return set(found)
+        ids &= found
+        return ids
 
+    @staticmethod
+    def _get_requires_tokens(keywords):
+        """
+        Returns the requires index tokens of the "_requires" dictionary.
+        The required stream is ignored when it is empty.
+        """
+        tokens = []
+        for name, stream in keywords["_requires"].items():
+            if stream in (None, "", "None"):
+                tokens.append(name)
+            else:
+                tokens.append("{}:{}".format(name, stream))
+        return tokens
 
-    def _parse_version_or_release(self, keywords, keyword):
+    def _parse_requires(self, keywords):
         """
-        Parse the version or release for all the modules in the database
-       
+        Returns ids of modules requiring all the modules in the "_requires"
+        dictionary.
+
         :param keywords: dictionary of keywords to search for
-        :param keyword: keyword to search for. (This value is either 'release' or 'version')
         """
-        modules = []
-        inequality = keywords[keyword][0]
-        mmd_value = keywords[keyword][1]
+        return self.index.match_all("requires", self._get_requires_tokens(keywords))
 
-        for name, mods in self.mods.items():
-            for mod in mods:
-                modules = self._get_modules_by_inequality(keyword, inequality, mmd_value, modules, mod)
-
-        return modules
+    @staticmethod
+    def _get_literal_names(query):
+        """
+        Returns the set of searched names of the NameQuery when none of
+        them contains wildcards, None otherwise or when `query` is None.
+        """
+        if query is None or query.regex is not None:
+            return None
+        return query.literals
 
-    def _get_modules_by_inequality(self, keyword, inequality, mmd_value, modules, mod):
+    def _parse_version_or_release(self, field, inequality, value, reobj, names, ids):
         """
-        Checks the inequality input for 'release' or 'version'
+        Filters the module `ids` by version or release using the sorted
+        version index.
 
-        :param keyword: keyword to check for. (This value is either 'release' or 'version')
+        :param field: field to check for. (This value is either 'version' or 'stream')
         :param inequality: the inequality you want to check for (e.g., '<', '>', '==', etc)
-        :param mmd_value: value for either 'release' or 'version'
-        :param modules: list of modules
-        :param mod: module you want to check for
+        :param value: version or stream to compare with
+        :param reobj: compiled wildcard pattern of the `value` or None
+        :param names: set of searched names without wildcards or None
+        :param ids: set of module ids to filter, None for all modules
         """
+        #Handle wildcards, if necessary
+        if reobj is not None:
+            if ids is None:
+                ids = self.index.all_ids()
+            return set(mid for mid in ids
+                       if self._get_modules_by_inequality(field, inequality, reobj, mid))
 
-        #Select module metadata value
-        if keyword == "_version":
-            mmd = mod.mmd.version
-        else:
-            mmd = mod.mmd.release
+        # With exact names only, range scan just their per-name indexes.
+        return self.index.match_inequality(field, inequality, value, names, ids)
 
-        #Handle wildcards, if necessary
-        if "*" in mmd_value:
-            mmd_value_regex = fnmatch.translate(mmd_value)
-            reobj = re.compile(mmd_value_regex)
-            result = reobj.match(mmd)
+    def _get_modules_by_inequality(self, field, inequality, reobj, mid):
+        """
+        Checks the inequality with wildcard pattern for 'version' or
+        'stream' of single module. The module value matching the wildcard
+        pattern is treated as equal to it.
 
-            if result:
-                mmd_value = result.string
-            else:
-                return modules
-
-        #Parse inequality
-        if (inequality == "=="):
-            if (mmd == mmd_value):
-                 modules.append(mod)
-        elif (inequality == ">="):
-            if (mmd >= mmd_value):
-                modules.append(mod)
-        elif (inequality == "<="):
-            if (mmd <= mmd_value):
-                modules.append(mod)
-        elif (inequality == "<"):
-            if (mmd < mmd_value):
-                modules.append(mod)
-        elif (inequality == ">"):
-            if (mmd > mmd_value):
-                modules.append(mod)
-        elif (inequality == "!="):
-            if (mmd != mmd_value):
-                modules.append(mod)
-        return modules
-
-
-    def _check_for_wildcards_in_name(self, keywords):
-        """
-        For a given list of module names, check if there are wildcard
-        """
-        wildcards = False
-
-        if "_name" not in keywords:
-            return wildcards
-
-        for mod_name in keywords["_name"]:
-            if "*" in mod_name:
-                wildcards = True
-                break
-
-        return wildcards
+        :param field: field to check for. (This value is either 'version' or 'stream')
+        :param inequality: the inequality you want to check for (e.g., '<', '>', '==', etc)
+        :param reobj: compiled wildcard pattern of the version or stream
+        :param mid: id of the module you want to check for
+        :return: True if the module matches the inequality.
+        """
+        matches = reobj.match(self.index.get_value(field, mid)) is not None
+        if inequality in ("==", "<=", ">="):
+            return matches
+        elif inequality == "!=":
+            return not matches
+        return False
@@ -0,0 +1,136 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""
+BM25 ranked full-text search over module summaries and descriptions.
+"""
+
+from __future__ import print_function
+
+import heapq
+import math
+import re
+
+from fm.modules_index import tokenize
+
+#: BM25 term frequency saturation parameter.
+BM25_K1 = 1.2
+#: BM25 document length normalization parameter.
+BM25_B = 0.75
+
+#: Regular expression splitting compound tokens like "node.js".
+COMPOUND_SEPARATOR_RE = re.compile(r"[.+-]")
+
+
+def text_tokens(text):
+    """
+    Returns the tokens of the `text` for full-text search. Compound tokens
+    like "node.js" are indexed also by their parts.
+
+    :rtype: list
+    """
+    tokens = []
+    for token in tokenize(text):
+        tokens.append(token)
+        parts = COMPOUND_SEPARATOR_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def build_text_index(modules):
+    """
+    Returns JSON serializable full-text index data of the `modules`:
+
+    - docs: list of [name, stream, version, summary, number of tokens].
+    - postings: token -> list of [position in docs, token frequency].
+
+    :param iterable modules: ModuleMetadata instances.
+    :rtype: dict
+    """
+    docs = []
+    postings = {}
+    for mmd in modules:
+        tokens = text_tokens(mmd.summary) + text_tokens(mmd.description)
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        doc = len(docs)
+        docs.append([mmd.name, mmd.stream, mmd.version, mmd.summary, len(tokens)])
+        for token, frequency in frequencies.items():
+            postings.setdefault(token, []).append([doc, frequency])
+
+    return {"docs": docs, "postings": postings}
+
+
+class TextIndex(object):
+    """
+    Ranks modules by BM25 score of their summary and description. The
+    index is composed of the per-repo index data built by build_text_index,
+    so only the data of changed repos have to be rebuilt.
+    """
+
+    def __init__(self, datas):
+        """
+        Creates new TextIndex instance.
+
+        :param list datas: Index data returned by build_text_index.
+        """
+        #: Index data of each repo.
+        self.datas = datas
+        #: Number of documents.
+        self.count = sum(len(data["docs"]) for data in datas)
+        total_length = sum(doc[4] for data in datas for doc in data["docs"])
+        #: Average document length.
+        self.avg_length = float(total_length) / self.count if self.count else 0.0
+
+    def get_idf(self, token):
+        """
+        Returns inverse document frequency of the `token`.
+        """
+        df = sum(len(data["postings"].get(token, ())) for data in self.datas)
+        return math.log(1.0 + (self.count - df + 0.5) / (df + 0.5))
+
+    def search(self, text, limit=10):
+        """
+        Returns the `limit` modules with the best BM25 score for the `text`.
+        Only the documents in the posting lists of the query tokens are
+        scored.
+
+        :param string text: Query text.
+        :param int limit: Maximum number of results.
+        :return: List of (score, name, stream, version, summary) tuples,
+            the best match first.
+        :rtype: list
+        """
+        scores = {}
+        for token in set(text_tokens(text)):
+            idf = self.get_idf(token)
+            for repo, data in enumerate(self.datas):
+                docs = data["docs"]
+                for doc, frequency in data["postings"].get(token, ()):
+                    norm = 1.0 - BM25_B + BM25_B * docs[doc][4] / self.avg_length
+                    score = idf * frequency * (BM25_K1 + 1.0) / (frequency + BM25_K1 * norm)
+                    scores[(repo, doc)] = scores.get((repo, doc), 0.0) + score
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        results = []
+        for (repo, doc), score in best:
+            name, stream, version, summary, _ = self.datas[repo]["docs"][doc]
+            results.append((score, name, stream, version, summary))
+        return results
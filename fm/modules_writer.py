@@ -0,0 +1,195 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Library General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""
+Streaming output of modules descriptions.
+"""
+
+from __future__ import print_function
+
+import json
+
+
+#: Number of spaces between the columns of the brief description.
+COLUMN_PADDING = 4
+
+
+def brief_rows(mods, only_enabled=False):
+    """
+    Generates the rows of the brief description of modules.
+
+    Column widths are computed from the names and versions of the modules
+    first, so `mods` has to be iterable more than once.
+
+    :param iterable mods: ModuleMetadata instances to describe.
+    :param bool only_enabled: Skip the enabled modules.
+    :return: Generator of rows without the trailing '\\n'.
+    """
+    max_name_width = 0
+    max_vr_width = 0
+    for module_metadata in mods:
+        max_name_width = max(max_name_width, len(module_metadata.name))
+        max_vr_width = max(max_vr_width, len(str(module_metadata.version)))
+
+    max_name_width += COLUMN_PADDING
+    max_vr_width += COLUMN_PADDING
+
+    for module_metadata in mods:
+        if only_enabled and module_metadata.is_enabled():
+            continue
+
+        # Show output in 3 columns...
+        yield "".join((module_metadata.name.ljust(max_name_width),
+                       str(module_metadata.version).ljust(max_vr_width),
+                       module_metadata.summary))
+
+
+def table_rows(rows):
+    """
+    Generates the rows of a table with columns aligned to the widest value.
+
+    :param list rows: Tuples of column values.
+    :return: Generator of rows without the trailing '\\n'.
+    """
+    widths = []
+    for row in rows:
+        for i, value in enumerate(row):
+            if i == len(widths):
+                widths.append(0)
+            widths[i] = max(widths[i], len(str(value)))
+
+    for row in rows:
+        columns = [str(value).ljust(widths[i] + COLUMN_PADDING)
+                   for i, value in enumerate(row[:-1])]
+        columns.append(str(row[-1]))
+        yield "".join(columns)
+
+
+def full_rows(mods):
+    """
+    Generates the full description of each module.
+
+    :param iterable mods: ModuleMetadata instances to describe.
+    :return: Generator of module descriptions.
+    """
+    for module_metadata in mods:
+        yield module_metadata.dump_to_string()
+
+
+def _json_default(obj):
+    """
+    Encodes the sets used by ModuleMetadata as sorted JSON lists.
+    """
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError("{!r} is not JSON serializable".format(obj))
+
+
+class ModulesWriter(object):
+    """
+    Writes descriptions of modules to the output file as they are
+    generated instead of building the whole output in memory first.
+    """
+
+    def __init__(self, output):
+        """
+        Creates new ModulesWriter instance.
+
+        :param file output: File to which the output is written.
+        """
+        #: File to which the output is written.
+        self.output = output
+        #: Encoder used to write the JSON Lines output.
+        self.json_encoder = json.JSONEncoder(sort_keys=True,
+                                             default=_json_default)
+
+    def write_rows(self, rows):
+        """
+        Writes each row followed by '\\n' to the output.
+
+        :param iterable rows: Rows to write.
+        :return: Number of written rows.
+        :rtype: int
+        """
+        count = 0
+        for row in rows:
+            self.output.write(row)
+            self.output.write("\n")
+            count += 1
+
+        self.output.flush()
+        return count
+
+    def write_brief_description(self, mods, only_enabled=False):
+        """
+        Writes brief description of modules, one module per row.
+
+        :param iterable mods: ModuleMetadata instances to describe.
+        :param bool only_enabled: Skip the enabled modules.
+        :return: Number of written rows.
+        :rtype: int
+        """
+        return self.write_rows(brief_rows(mods, only_enabled))
+
+    def write_full_description(self, mods):
+        """
+        Writes full description of modules separated by an empty line.
+
+        :param iterable mods: ModuleMetadata instances to describe.
+        :return: Number of described modules.
+        :rtype: int
+        """
+        return self.write_rows(full_rows(mods))
+
+    def write_table(self, rows):
+        """
+        Writes rows of a table with aligned columns.
+
+        :param list rows: Tuples of column values.
+        :return: Number of written rows.
+        :rtype: int
+        """
+        return self.write_rows(table_rows(rows))
+
+    def write_jsonl(self, objs):
+        """
+        Writes each object as a single line of JSON. The objects are encoded
+        incrementally, chunk by chunk, directly to the output.
+
+        :param iterable objs: JSON serializable objects.
+        :return: Number of written objects.
+        :rtype: int
+        """
+        count = 0
+        for obj in objs:
+            for chunk in self.json_encoder.iterencode(obj):
+                self.output.write(chunk)
+            self.output.write("\n")
+            count += 1
+
+        self.output.flush()
+        return count
+
+    def write_jsonl_modules(self, mods):
+        """
+        Writes the metadata of each module as a single line of JSON.
+
+        :param iterable mods: ModuleMetadata instances to describe.
+        :return: Number of written modules.
+        :rtype: int
+        """
+        return self.write_jsonl(mmd.dump_to_dict() for mmd in mods)
@@ -131,6 +131,36 @@ class ModuleCommand(dnf.cli.Command):
         parser.add_argument('--json', dest='_search_json',
                              action='append', default=[],
                              help=_("Search using json (See `--json help` for more details.)"))
+        parser.add_argument('--rpm', dest='_search_rpm',
+                            action='append', default=[],
+                            help=_("show which modules ship the RPM"))
+        parser.add_argument('--fuzzy', dest='_search_fuzzy',
+                            action='append', default=[],
+                            help=_("search for modules with similar name or summary"))
+        parser.add_argument('--text', dest='_search_text',
+                            action='append', default=[],
+                            help=_("full-text search in module summaries and descriptions"))
+        parser.add_argument('--whatrequires', dest='_search_whatrequires',
+                            action='append', default=[],
+                            help=_("search for modules requiring the name[:stream] module"))
+        parser.add_argument('--recursive', dest='recursive',
+                            action='store_true', default=False,
+                            help=_("with --whatrequires, search also for indirect dependents"))
+        parser.add_argument('--plan', dest='plan',
+                            action='store_true', default=False,
+                            help=_("only show what install would do and how long each phase took"))
+        parser.add_argument('--explain', dest='explain',
+                            action='store_true', default=False,
+                            help=_("show the search plan and timings"))
+        parser.add_argument('--limit', dest='limit', type=int, default=None,
+                            help=_("list at most this number of modules"))
+        parser.add_argument('--offset', dest='offset', type=int, default=0,
+                            help=_("skip this number of modules when listing"))
+        parser.add_argument('--sort', dest='sort', default=None,
+                            help=_("sort listed modules by name, version or summary"))
+        parser.add_argument('--format', dest='format', default='text',
+                            choices=['text', 'jsonl'],
+                            help=_("output format, 'jsonl' prints one JSON object per module"))
 
     def configure(self):
         self._setup_resolving()
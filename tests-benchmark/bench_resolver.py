@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# Copyright (C) 2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""
+Benchmarks of enabling a stack of modules one by one and in a single batch.
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+from fm.modules_resolver import ModulesResolver
+from synthetic import make_stack
+
+
+def make_resolver(mmds):
+    resolver = ModulesResolver()
+    resolver.load_repo(resolver.available, mmds)
+    return resolver
+
+
+def bench_one_by_one(mmds, names):
+    resolver = make_resolver(mmds)
+    start = time.time()
+    for name in names:
+        ret = resolver.solve_enable(name)
+        assert ret is not None and not ret.problems
+    return time.time() - start
+
+
+def bench_batch(mmds, names):
+    resolver = make_resolver(mmds)
+    start = time.time()
+    ret = resolver.solve_enable(names)
+    assert ret is not None and not ret.problems
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 500],
+                        help="numbers of modules in the enabled stack")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    print("{:>8}  {:>14}  {:>14}  {:>8}".format("modules", "one by one ms", "batch ms", "speedup"))
+    for size in args.sizes:
+        mmds = make_stack(size)
+        names = ["mod{}".format(i) for i in range(size)]
+        one_by_one = min(bench_one_by_one(mmds, names) for _ in range(args.repeat))
+        batch = min(bench_batch(mmds, names) for _ in range(args.repeat))
+        print("{:>8}  {:>14.2f}  {:>14.2f}  {:>7.1f}x".format(
+            size, one_by_one * 1000, batch * 1000, one_by_one / batch))
+
+
+if __name__ == "__main__":
+    main()
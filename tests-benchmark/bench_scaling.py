@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# Copyright (C) 2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""
+Benchmarks of the ModulesResolver phases on synthetic catalogs of various
+shapes and sizes, compared with the baselines stored on this machine.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import solv
+
+from fm.modules_resolver import ModulesResolver, ModulesResolverResult
+from synthetic import SHAPES, VERSIONS
+
+#: File with the baseline timings in milliseconds. The timings are machine
+#: specific, so the file is not part of the sources.
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "baselines.json")
+
+#: Phases measured for every catalog, in the order they run.
+PHASES = ("pool build", "createwhatprovides", "solve_enable", "classify",
+          "solve_update", "solve_disable")
+
+
+def timed(timings, phase, fnc, *args):
+    """
+    Calls `fnc(*args)` and keeps the shortest time of the `phase` in
+    milliseconds in `timings`.
+    """
+    start = time.time()
+    ret = fnc(*args)
+    elapsed = (time.time() - start) * 1000
+    timings[phase] = min(timings.get(phase, elapsed), elapsed)
+    return ret
+
+
+def run_catalog(mmds, target, timings):
+    """
+    Measures the resolver phases on the catalog `mmds`, solving the
+    `target` module spec.
+    """
+    # Nothing is enabled, the target is enabled together with all its
+    # dependencies.
+    resolver = ModulesResolver()
+    timed(timings, "pool build", resolver.load_repo, resolver.available, mmds)
+    timed(timings, "createwhatprovides", resolver.prepare)
+    ret = timed(timings, "solve_enable", resolver.solve_enable, target)
+    assert ret is not None and not ret.problems
+
+    # Solve again without the classification to measure it separately.
+    solver = resolver.prepare()
+    solver.solve(resolver.select(target).jobs(solv.Job.SOLVER_INSTALL))
+    trans = solver.transaction()
+    timed(timings, "classify", ModulesResolverResult, resolver._id2mmd, [], trans)
+
+    # The first versions are enabled, the second ones available.
+    resolver = ModulesResolver()
+    resolver.load_repo(resolver.enabled,
+                       [mmd for mmd in mmds if mmd.version == VERSIONS[0]])
+    resolver.load_repo(resolver.available,
+                       [mmd for mmd in mmds if mmd.version != VERSIONS[0]])
+    resolver.prepare()
+    timed(timings, "solve_update", resolver.solve_update, target)
+    timed(timings, "solve_disable", resolver.solve_disable, target)
+
+
+def load_baselines():
+    try:
+        with open(BASELINES_FILE) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shapes", nargs="+", choices=sorted(SHAPES),
+                        default=sorted(SHAPES), help="catalog shapes")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 50000],
+                        help="numbers of modules in the catalogs")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of runs, the best one is reported")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown against the baseline, 0.5 is 50%%")
+    parser.add_argument("--save-baselines", action="store_true",
+                        help="store the timings as the new baselines")
+    parser.add_argument("--check", action="store_true",
+                        help="fail when some phase is slower than the baseline")
+    args = parser.parse_args()
+
+    baselines = load_baselines()
+    results = {}
+    regressions = []
+
+    print("{:<20}{:<20}{:>12}{:>12}{:>8}".format(
+        "catalog", "phase", "ms", "baseline", "ratio"))
+    for shape in args.shapes:
+        for size in args.sizes:
+            mmds, target = SHAPES[shape](size)
+            timings = {}
+            for _ in range(args.repeat):
+                run_catalog(mmds, target, timings)
+
+            key = "{}/{}".format(shape, size)
+            results[key] = timings
+            for phase in PHASES:
+                elapsed = timings[phase]
+                baseline = baselines.get(key, {}).get(phase)
+                if baseline:
+                    ratio = elapsed / baseline
+                    # Sub-millisecond phases are too noisy to compare.
+                    if ratio > 1 + args.tolerance and elapsed > 1:
+                        regressions.append((key, phase, ratio))
+                    print("{:<20}{:<20}{:>12.2f}{:>12.2f}{:>7.2f}x".format(
+                        key, phase, elapsed, baseline, ratio))
+                else:
+                    print("{:<20}{:<20}{:>12.2f}{:>12}{:>8}".format(
+                        key, phase, elapsed, "-", "-"))
+
+    if args.save_baselines:
+        for key, timings in results.items():
+            baselines[key] = dict((phase, round(elapsed, 2))
+                                  for phase, elapsed in timings.items())
+        with open(BASELINES_FILE, "w") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write("\n")
+        return 0
+
+    for key, phase, ratio in regressions:
+        print("Regression: {} {} is {:.2f}x slower than the baseline".format(
+            key, phase, ratio))
+    return 1 if regressions and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
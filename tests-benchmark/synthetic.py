@@ -0,0 +1,128 @@
+# Copyright (C) 2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""
+Synthetic module catalogs for the resolver benchmarks.
+
+Each generator returns (list of SyntheticModule, target module spec) with
+about `size` modules, every module in two versions.
+"""
+
+#: Versions of every synthetic module.
+VERSIONS = (1, 2)
+
+
+class SyntheticModule(object):
+    """
+    Minimal stand-in for ModuleMetadata used by the ModulesResolver.
+    """
+
+    def __init__(self, name, version, requires, stream="master"):
+        self.name = name
+        self.stream = stream
+        self.version = version
+        self.requires = requires
+
+
+def _module(name, requires, stream="master"):
+    return [SyntheticModule(name, version, requires, stream) for version in VERSIONS]
+
+
+def make_stack(size):
+    """
+    Returns a stack of `size` modules, every module requires the previous
+    one and the "core" module.
+    """
+    mmds = _module("core", {})
+    for i in range(size):
+        requires = {"core": "master"}
+        if i > 0:
+            requires["mod{}".format(i - 1)] = "master"
+        mmds += _module("mod{}".format(i), requires)
+    return mmds
+
+
+def make_chain(size):
+    """
+    Deep chain: every module requires the previous one, the target is the
+    last one.
+    """
+    mmds = []
+    for i in range(size):
+        requires = {"mod{}".format(i - 1): "master"} if i > 0 else {}
+        mmds += _module("mod{}".format(i), requires)
+    return mmds, "mod{}".format(size - 1)
+
+
+def make_fanout(size):
+    """
+    Wide fan-out: the target requires all the other modules.
+    """
+    mmds = []
+    leaves = {}
+    for i in range(size - 1):
+        mmds += _module("leaf{}".format(i), {})
+        leaves["leaf{}".format(i)] = "master"
+    mmds += _module("root", leaves)
+    return mmds, "root"
+
+
+def make_diamonds(size):
+    """
+    Chain of diamonds: every top module requires two middle modules of
+    any stream. The left one has two streams, each requiring the same
+    stream of the base module; the right one has only the second stream.
+    The solver has to choose the left stream matching the right one.
+    """
+    mmds = []
+    for i in range(size // 6):
+        base = "base{}".format(i)
+        left = "left{}".format(i)
+        right = "right{}".format(i)
+        for stream in ("s1", "s2"):
+            mmds += _module(base, {}, stream)
+            mmds += _module(left, {base: stream}, stream)
+        mmds += _module(right, {base: "s2"}, "s2")
+        requires = {left: "", right: ""}
+        if i > 0:
+            requires["top{}".format(i - 1)] = "master"
+        mmds += _module("top{}".format(i), requires)
+    return mmds, "top{}".format(size // 6 - 1)
+
+
+def make_streams(size, streams=10):
+    """
+    Many streams per module: `size` / `streams` modules with `streams`
+    streams each, every stream of a module requires the same stream of the
+    previous module. The target is a stream of the last module.
+    """
+    mmds = []
+    count = max(size // streams, 1)
+    for i in range(count):
+        for s in range(streams):
+            requires = {"mod{}".format(i - 1): "s{}".format(s)} if i > 0 else {}
+            mmds += _module("mod{}".format(i), requires, "s{}".format(s))
+    return mmds, "mod{}:s{}".format(count - 1, streams // 2)
+
+
+#: Name of the shape -> generator of the synthetic catalog.
+SHAPES = {
+    "chain": make_chain,
+    "fanout": make_fanout,
+    "diamonds": make_diamonds,
+    "streams": make_streams,
+}
@@ -0,0 +1,123 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+import unittest
+from collections import OrderedDict
+
+import fm.exceptions
+import fm.modules
+from fm.metadata import ModuleMetadata
+from fm.modules_index import ModulesIndex
+
+
+def make_module(name, version, summary):
+    mmd = ModuleMetadata(None)
+    mmd.load({
+        "document": "modulemd",
+        "version": 1,
+        "data": {
+            "name": name,
+            "stream": "master",
+            "version": version,
+            "summary": summary,
+            "description": summary,
+            "license": {"module": ["MIT"]},
+        },
+    })
+    return mmd
+
+
+def make_modules():
+    return [
+        make_module("httpd", 3, "Apache httpd webserver module"),
+        make_module("core", 1, "Core module"),
+        make_module("apr", 2, "APR libraries module"),
+        make_module("tools", 2, "Basic tools"),
+    ]
+
+
+class Catalog(object):
+
+    def __init__(self, modules):
+        self.index = ModulesIndex(modules)
+
+
+class Modules(fm.modules.Modules):
+    """
+    Modules loaded from the in-memory `modules` instead of the DNF repos.
+    """
+
+    def __init__(self, modules):
+        OrderedDict.__init__(self)
+        self.catalog = Catalog(modules)
+        for mmd in modules:
+            self[mmd.name] = mmd
+
+
+class SelectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mods = Modules(make_modules())
+
+    def select(self, **kwargs):
+        return [mmd.name for mmd in self.mods.select(**kwargs)]
+
+    def test_select_all(self):
+        self.assertEqual(self.select(), ["httpd", "core", "apr", "tools"])
+
+    def test_select_page(self):
+        self.assertEqual(self.select(limit=2, offset=1), ["core", "apr"])
+        self.assertEqual(self.select(offset=3), ["tools"])
+        self.assertEqual(self.select(limit=2, offset=4), [])
+        self.assertEqual(self.select(limit=0), [])
+
+    def test_select_sorted(self):
+        self.assertEqual(self.select(sort="name"), ["apr", "core", "httpd", "tools"])
+        self.assertEqual(self.select(sort="name", limit=2, offset=1), ["core", "httpd"])
+
+    def test_select_sorted_descending(self):
+        self.assertEqual(self.select(sort="-name"), ["tools", "httpd", "core", "apr"])
+        self.assertEqual(self.select(sort="-name", limit=1, offset=1), ["httpd"])
+
+    def test_select_sorted_ties(self):
+        self.assertEqual(self.select(sort="version"), ["core", "apr", "tools", "httpd"])
+        self.assertEqual(self.select(sort="-version", limit=3), ["httpd", "tools", "apr"])
+
+    def test_select_unknown_sort_key(self):
+        self.assertRaises(fm.exceptions.Error, self.mods.select, sort="size")
+
+
+class SortedModulesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mods = Modules(make_modules())
+
+    def get_error(self, name):
+        try:
+            self.mods.get_sorted_modules(name)
+        except fm.exceptions.DependencyError as err:
+            return str(err)
+        self.fail("DependencyError not raised")
+
+    def test_known_module(self):
+        self.assertEqual([mmd.name for mmd in self.mods.get_sorted_modules("apr")], ["apr"])
+
+    def test_suggestion(self):
+        self.assertEqual(self.get_error("htpd"), "Unknown module htpd. Did you mean: httpd?")
+
+    def test_no_suggestion(self):
+        self.assertEqual(self.get_error("xyz"), "Unknown module xyz")
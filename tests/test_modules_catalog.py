@@ -0,0 +1,117 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import yaml
+
+from fm.metadata import ModuleMetadataLoader
+from fm.modules_catalog import ModulesCatalog
+
+
+def make_module(name, stream, version):
+    return {
+        "document": "modulemd",
+        "version": 1,
+        "data": {
+            "name": name,
+            "stream": stream,
+            "version": version,
+            "summary": name,
+            "description": name,
+            "license": {"module": ["MIT"]},
+        },
+    }
+
+
+class Repo(object):
+    """
+    DNF module repo with the modules file in the `cachedir`.
+    """
+
+    def __init__(self, repo_id, cachedir, modules):
+        self.id = repo_id
+        self._cachedir = cachedir
+        self.writes = 0
+        self.write(modules)
+
+    def write(self, modules):
+        repodata = os.path.join(self._cachedir, "repodata")
+        if not os.path.isdir(repodata):
+            os.makedirs(repodata)
+        modules_file = os.path.join(repodata, "modules.yaml.gz")
+        with gzip.open(modules_file, "wb") as f:
+            f.write(yaml.safe_dump({"modules": modules}).encode("utf-8"))
+        # The fingerprint includes the mtime, every write gets a new one.
+        self.writes += 1
+        os.utime(modules_file, (self.writes, self.writes))
+
+
+class ModulesCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.catalog = ModulesCatalog()
+        self.catalog.cache_dir = os.path.join(self.tmp_dir, "cache")
+        self.repos = [
+            Repo("repo1", os.path.join(self.tmp_dir, "repo1"),
+                 [make_module("core", "1", 1), make_module("apr", "1", 1)]),
+            Repo("repo2", os.path.join(self.tmp_dir, "repo2"),
+                 [make_module("httpd", "2.4", 1)]),
+        ]
+
+        #: Repo id -> number of ModuleMetadataLoader.load calls.
+        self.loads = {}
+        self.orig_load = ModuleMetadataLoader.load
+        test = self
+
+        def load(loader):
+            test.loads[loader.repo.id] = test.loads.get(loader.repo.id, 0) + 1
+            return test.orig_load(loader)
+        ModuleMetadataLoader.load = load
+
+    def tearDown(self):
+        ModuleMetadataLoader.load = self.orig_load
+        shutil.rmtree(self.tmp_dir)
+
+    def names(self):
+        return [mmd.name for mmd in self.catalog]
+
+    def test_load_once_per_repo(self):
+        self.catalog.load(self.repos)
+        self.catalog.load(self.repos)
+        self.assertEqual(self.loads, {"repo1": 1, "repo2": 1})
+        self.assertEqual(self.names(), ["core", "apr", "httpd"])
+
+    def test_load_changed_repo(self):
+        self.catalog.load(self.repos)
+        self.repos[1].write([make_module("httpd", "2.4", 2)])
+        self.catalog.load(self.repos)
+        self.assertEqual(self.loads, {"repo1": 1, "repo2": 2})
+        self.assertEqual([mmd.version for mmd in self.catalog], [1, 1, 2])
+
+    def test_load_forgets_removed_repo(self):
+        self.catalog.load(self.repos)
+        fingerprint = self.catalog.get_fingerprint()
+        self.catalog.load(self.repos[:1])
+        self.assertEqual(self.names(), ["core", "apr"])
+        self.assertNotEqual(self.catalog.get_fingerprint(), fingerprint)
+        self.assertEqual(self.catalog.get_modules_by_name("httpd"), [])
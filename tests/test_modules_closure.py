@@ -0,0 +1,115 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+import unittest
+
+from fm.metadata import ModuleMetadata
+from fm.modules_closure import DependencyClosures, close, iter_bits
+
+
+def make_module(name, stream, requires=None):
+    mmd = ModuleMetadata(None)
+    mmd.name = name
+    mmd.stream = stream
+    mmd.requires = requires or {}
+    return mmd
+
+
+class CloseTest(unittest.TestCase):
+
+    def test_chain(self):
+        # 0 <- 1 <- 2, 3 is independent.
+        self.assertEqual(close([[], [0], [1], []]), [0, 0b1, 0b11, 0])
+
+    def test_diamond(self):
+        # 3 requires 1 and 2, both require 0.
+        self.assertEqual(close([[], [0], [0], [1, 2]]), [0, 0b1, 0b1, 0b111])
+
+    def test_cycle(self):
+        # 0 and 1 require each other, 2 requires 1.
+        closures = close([[1], [0], [1]])
+        self.assertEqual(closures, [0b11, 0b11, 0b11])
+
+    def test_iter_bits(self):
+        self.assertEqual(list(iter_bits(0b10110)), [1, 2, 4])
+        self.assertEqual(list(iter_bits(0)), [])
+
+
+class DependencyClosuresTest(unittest.TestCase):
+
+    def setUp(self):
+        self.closures = DependencyClosures([
+            make_module("core", "1"),
+            make_module("core", "2"),
+            make_module("apr", "1", {"core": "1"}),
+            make_module("httpd", "2.4", {"apr": "1:20170101", "core": "1"}),
+            make_module("php", "7", {"httpd": "2.4"}),
+            make_module("tools", "1", {"core": ""}),
+            make_module("python", "3", {"core": "2"}),
+        ])
+
+    def mask(self, *keys):
+        return self.closures.get_mask(keys)
+
+    def test_pinned_version_requires_stream(self):
+        closure = self.closures.get_closure(self.mask(("httpd", "2.4")))
+        self.assertEqual(sorted(self.closures.get_keys(closure)),
+                         [("apr", "1"), ("core", "1")])
+
+    def test_transitive_closure(self):
+        closure = self.closures.get_closure(self.mask(("php", "7")), must=True)
+        self.assertEqual(sorted(self.closures.get_keys(closure)),
+                         [("apr", "1"), ("core", "1"), ("httpd", "2.4")])
+
+    def test_requires_without_stream(self):
+        may = self.closures.get_closure(self.mask(("tools", "1")))
+        must = self.closures.get_closure(self.mask(("tools", "1")), must=True)
+        self.assertEqual(may, self.mask(("core", "1"), ("core", "2")))
+        self.assertEqual(must, 0)
+
+    def test_get_orphans(self):
+        enabled = self.mask(("core", "1"), ("apr", "1"), ("httpd", "2.4"), ("php", "7"))
+        removed = self.mask(("php", "7"))
+        orphans = self.closures.get_orphans(enabled, self.mask(("php", "7")), removed)
+        self.assertEqual(orphans, self.mask(("core", "1"), ("apr", "1"), ("httpd", "2.4")))
+
+    def test_get_orphans_kept(self):
+        enabled = self.mask(("core", "1"), ("apr", "1"), ("httpd", "2.4"), ("php", "7"))
+        removed = self.mask(("php", "7"))
+        kept = self.mask(("apr", "1"))
+        orphans = self.closures.get_orphans(enabled, kept, removed)
+        self.assertEqual(orphans, self.mask(("httpd", "2.4")))
+
+    def test_get_orphans_required_by_staying(self):
+        enabled = self.mask(("core", "1"), ("apr", "1"), ("httpd", "2.4"), ("tools", "1"))
+        removed = self.mask(("httpd", "2.4"))
+        kept = self.mask(("tools", "1"))
+        orphans = self.closures.get_orphans(enabled, kept, removed)
+        self.assertEqual(orphans, self.mask(("apr", "1")))
+
+    def test_get_orphans_without_removed(self):
+        enabled = self.mask(("core", "1"), ("apr", "1"), ("tools", "1"))
+        orphans = self.closures.get_orphans(enabled, self.mask(("tools", "1")))
+        self.assertEqual(orphans, self.mask(("apr", "1")))
+
+    def test_get_conflicts(self):
+        conflicts = self.closures.get_conflicts(self.mask(("php", "7"), ("python", "3")))
+        self.assertEqual(conflicts, {"core": ["1", "2"]})
+
+    def test_get_conflicts_none(self):
+        conflicts = self.closures.get_conflicts(self.mask(("php", "7"), ("tools", "1")))
+        self.assertEqual(conflicts, {})
@@ -0,0 +1,524 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+# fm.modules imports fm.modules_resolver, so it has to be imported first.
+import fm.exceptions
+import fm.modules
+from fm.metadata import ModuleMetadata
+from fm.metadata_cache import CachedModuleMetadata
+from fm.modules_catalog import ModulesCatalog
+from fm.modules_resolver import ModulesResolver, ModulesResolverResult
+from fm.modules_resolver.modules_resolver import FmModulesResolver
+
+
+class Metadata(ModuleMetadata):
+    """
+    ModuleMetadata enabled without a DNF configuration.
+    """
+    enabled = False
+
+    def is_enabled(self):
+        return self.enabled
+
+
+def make_module(name, stream, version, requires=None, rpms=()):
+    mmd = Metadata(None)
+    mmd.load({
+        "document": "modulemd",
+        "version": 1,
+        "data": {
+            "name": name,
+            "stream": stream,
+            "version": version,
+            "summary": name,
+            "description": name,
+            "license": {"module": ["MIT"]},
+            "dependencies": {"requires": requires or {}},
+            "profiles": {"default": {"rpms": list(rpms)}},
+        },
+    })
+    return mmd
+
+
+def make_repos():
+    return [
+        ("repo1", [
+            make_module("core", "1", 1),
+            make_module("httpd", "2.4", 1, {"core": "1"}),
+        ]),
+        ("repo2", [
+            make_module("tools", "1", 1),
+        ]),
+    ]
+
+
+class Catalog(ModulesCatalog):
+
+    def __init__(self, cache_dir, repos):
+        ModulesCatalog.__init__(self)
+        self.cache_dir = cache_dir
+        for repo_id, modules in repos:
+            self._repos[repo_id] = ((repo_id,), modules)
+
+
+class RepoFile(object):
+
+    def __init__(self):
+        self.created = False
+
+    def create(self):
+        self.created = True
+
+    def remove(self):
+        self.created = False
+
+
+class Module(object):
+
+    def __init__(self, mmd, repo_file):
+        self.name = mmd.name
+        self.mmd = mmd
+        #: RepoFile shared by all the versions of the module.
+        self.repo_file = repo_file
+        #: Error raised by prepare or None.
+        self.error = None
+        #: Lists of RPMs passed to install_rpms.
+        self.installed = []
+        #: Values of the prepared argument of the enable calls.
+        self.enabled = []
+        self.upgraded = False
+
+    def is_enabled(self):
+        return self.mmd.is_enabled()
+
+    def prepare(self, call_dnf=True):
+        if self.error is not None:
+            raise self.error
+        self.repo_file.created = True
+
+    def get_profile_rpms(self, profiles):
+        rpms = []
+        for profile in profiles:
+            if profile in self.mmd.profiles:
+                rpms += sorted(self.mmd.profiles[profile].rpms)
+        return rpms
+
+    def install_rpms(self, rpms):
+        self.installed.append(rpms)
+
+    def enable(self, profiles=["default"], call_dnf=True, prepared=False):
+        self.enabled.append(prepared)
+
+    def disable(self, call_dnf=True):
+        self.repo_file.remove()
+
+    def upgrade(self, call_dnf=True):
+        self.upgraded = True
+
+
+class EnabledCache(object):
+
+    def __init__(self):
+        #: Number of get_depending_mods calls.
+        self.reads = 0
+        #: NVRs of the stored and removed modules.
+        self.stored = []
+        self.removed = []
+
+    def is_cached(self, mod):
+        return True
+
+    def store(self, mod, enabled_by_user=False):
+        self.stored.append(mod.mmd.get_nvr())
+
+    def remove(self, mod):
+        self.removed.append(mod.mmd.get_nvr())
+
+    def add_depending_mod(self, mod, name):
+        pass
+
+    def remove_depending_mod(self, mod, name):
+        pass
+
+    def get_depending_mods(self, mod):
+        self.reads += 1
+        return []
+
+
+class Options(object):
+    no_dnf = False
+
+
+class Modules(object):
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.enabled_cache = EnabledCache()
+        self.opts = Options()
+        repo_files = {}
+        self.modules = [Module(mmd, repo_files.setdefault(mmd.name, RepoFile()))
+                        for mmd in catalog]
+
+    def __contains__(self, name):
+        return len(self[name]) > 0
+
+    def __getitem__(self, name):
+        return [mod for mod in self.modules if mod.name == name]
+
+    def get_modules(self, name, version=None):
+        return [mod for mod in self[name]
+                if version is None or mod.mmd.version == version] or None
+
+    def items(self):
+        return [(mmd.name, mmd) for mmd in self.catalog]
+
+
+def keys(mmds):
+    return sorted((mmd.name, mmd.stream, str(mmd.version)) for mmd in mmds)
+
+
+class ResolverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def make_resolver(self, repos):
+        return FmModulesResolver(Modules(Catalog(self.cache_dir, repos)))
+
+    def solv_files(self):
+        return sorted(os.listdir(os.path.join(self.cache_dir, "resolver")))
+
+
+class LoadRepoTest(ResolverTestCase):
+
+    def load(self, mmds):
+        resolver = ModulesResolver()
+        cache_file = os.path.join(self.cache_dir, "available.solv")
+        written = resolver.load_repo(resolver.available, mmds, cache_file)
+        ids = [solvable.id for solvable in resolver.available.solvables]
+        return written, [resolver._id2mmd[i] for i in ids]
+
+    def test_solv_file_reused(self):
+        mmds = [mmd for _, modules in make_repos() for mmd in modules]
+        self.assertEqual(self.load(mmds), (True, mmds))
+        self.assertEqual(self.load(mmds), (False, mmds))
+
+    def test_solv_file_other_order(self):
+        mmds = [mmd for _, modules in make_repos() for mmd in modules]
+        self.load(mmds)
+        mmds.reverse()
+        self.assertEqual(self.load(mmds), (True, mmds))
+
+
+class SolvCacheTest(ResolverTestCase):
+
+    def test_reordered_catalog(self):
+        repos = make_repos()
+        self.make_resolver(repos)
+
+        repos.reverse()
+        ret = self.make_resolver(repos).resolve("enable", ["httpd:2.4"])
+        self.assertEqual(keys(ret.to_enable), [("core", "1", "1"), ("httpd", "2.4", "1")])
+
+    def test_stale_solv_files_removed(self):
+        repos = make_repos()
+        self.make_resolver(repos)
+        files = self.solv_files()
+        self.assertEqual(len(files), 2)
+
+        self.make_resolver(repos)
+        self.assertEqual(self.solv_files(), files)
+
+        repos.reverse()
+        self.make_resolver(repos)
+        self.assertEqual(len(self.solv_files()), 2)
+        self.assertNotEqual(self.solv_files(), files)
+
+
+class CascadeDisableTest(ResolverTestCase):
+
+    def setUp(self):
+        ResolverTestCase.setUp(self)
+        modules = [
+            make_module("core", "1", 1),
+            make_module("apr", "1", 1, {"core": "1"}),
+            make_module("httpd", "2.4", 1, {"apr": "1:1"}),
+            make_module("tools", "1", 1, {"core": "1"}),
+        ]
+        for mmd in modules:
+            mmd.enabled = True
+        for mmd in (modules[2], modules[3]):
+            mmd.xmd = {CachedModuleMetadata.ENABLED_BY_USER: True}
+        self.resolver = self.make_resolver([("repo1", modules)])
+        self.closures = self.resolver.mods.catalog.closures
+
+    def test_cascade_reads_cache_once(self):
+        self.resolver._init_cascade()
+        reads = self.resolver.mods.enabled_cache.reads
+        self.assertEqual(reads, 2)
+
+        orphans = self.resolver._get_cascade_disable()
+        self.assertEqual(orphans, [])
+
+        self.resolver._removed_mask |= self.closures.get_mask([("httpd", "2.4")])
+        orphans = self.resolver._get_cascade_disable()
+        self.assertEqual(keys(orphans), [("apr", "1", "1")])
+
+        self.resolver._removed_mask |= self.closures.get_mask([("apr", "1")])
+        self.assertEqual(self.resolver._get_cascade_disable(), [])
+        self.assertEqual(self.resolver.mods.enabled_cache.reads, reads)
+
+
+def make_stack():
+    return [
+        make_module("core", "1", 1),
+        make_module("apr", "1", 1, {"core": "1"}),
+        make_module("apr", "1", 2, {"core": "1"}),
+        make_module("httpd", "2.2", 1, {"apr": "1:1"}),
+        make_module("httpd", "2.4", 1, {"apr": "1", "core": "1"}),
+        make_module("httpd", "2.4", 2, {"apr": "1", "core": "1"}),
+        make_module("tools", "1", 1, {"core": "1"}),
+    ]
+
+
+class SolveEnableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = ModulesResolver()
+        self.resolver.set_default_requires_operator("==")
+        self.resolver.load_repo(self.resolver.available, make_stack())
+
+    def test_batch(self):
+        ret = self.resolver.solve_enable(["httpd:2.4", "tools"])
+        self.assertEqual(ret.problems, [])
+        self.assertEqual(keys(ret.to_enable), [
+            ("apr", "1", "2"), ("core", "1", "1"), ("httpd", "2.4", "2"),
+            ("tools", "1", "1")])
+
+    def test_batch_same_as_one_by_one(self):
+        batch = self.resolver.solve_enable(["httpd:2.4", "tools"])
+        httpd = self.resolver.solve_enable("httpd:2.4")
+        tools = self.resolver.solve_enable("tools")
+        self.assertEqual(set(keys(batch.to_enable)),
+                         set(keys(httpd.to_enable + tools.to_enable)))
+
+    def test_batch_unknown_module(self):
+        self.assertIsNone(self.resolver.solve_enable(["httpd:2.4", "unknown"]))
+
+
+class SelectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = ModulesResolver()
+        self.resolver.set_default_requires_operator("==")
+        self.resolver.load_repo(self.resolver.available, make_stack())
+        self.resolver.prepare()
+
+    def select(self, arg):
+        sel = self.resolver.select(arg)
+        return keys(self.resolver._id2mmd[s.id] for s in sel.solvables())
+
+    def test_select_name(self):
+        self.assertEqual(self.select("httpd"), [
+            ("httpd", "2.2", "1"), ("httpd", "2.4", "1"), ("httpd", "2.4", "2")])
+
+    def test_select_stream(self):
+        self.assertEqual(self.select("httpd:2.4"), [
+            ("httpd", "2.4", "1"), ("httpd", "2.4", "2")])
+        self.assertEqual(self.select("httpd:2.10"), [])
+
+    def test_select_version(self):
+        self.assertEqual(self.select("httpd:2.4:1"), [("httpd", "2.4", "1")])
+        self.assertEqual(self.select("httpd:2.4:3"), [])
+
+    def test_enable_stream(self):
+        ret = self.resolver.solve_enable("httpd:2.2")
+        self.assertEqual(keys(ret.to_enable), [
+            ("apr", "1", "1"), ("core", "1", "1"), ("httpd", "2.2", "1")])
+
+    def test_requires_pinned_version_or_greater(self):
+        resolver = ModulesResolver()
+        resolver.set_default_requires_operator(">=")
+        resolver.load_repo(resolver.available, make_stack())
+        ret = resolver.solve_enable("httpd:2.2")
+        self.assertIn(("apr", "1", "2"), keys(ret.to_enable))
+
+
+class ResultReplayTest(ResolverTestCase):
+
+    def get_key(self, mmd):
+        return FmModulesResolver._get_key(mmd)
+
+    def test_dump_load(self):
+        resolver = ModulesResolver()
+        resolver.load_repo(resolver.available, make_stack())
+        ret = resolver.solve_enable("httpd:2.4")
+
+        key2mmd = dict((self.get_key(mmd), mmd) for mmd in make_stack())
+        data = json.loads(json.dumps(ret.dump(self.get_key)))
+        loaded = ModulesResolverResult.load(data, key2mmd)
+        self.assertEqual(keys(loaded.to_enable), keys(ret.to_enable))
+        self.assertEqual(loaded.to_disable, [])
+
+    def test_load_unknown_module(self):
+        data = {"to_disable": [], "to_enable": [["unknown", "1", "1"]],
+                "to_reinstall": [], "to_downgrade": [], "to_upgrade": []}
+        self.assertIsNone(ModulesResolverResult.load(data, {}))
+
+    def test_replay(self):
+        repos = [("repo1", make_stack())]
+        ret = self.make_resolver(repos).resolve("enable", ["httpd:2.4", "tools"])
+
+        resolver = self.make_resolver(repos)
+        resolver.solve_enable = lambda *args: self.fail("solved again")
+        replayed = resolver.resolve("enable", ["httpd:2.4", "tools"])
+        self.assertEqual(keys(replayed.to_enable), keys(ret.to_enable))
+
+    def test_no_replay_after_catalog_change(self):
+        repos = [("repo1", make_stack())]
+        self.make_resolver(repos).resolve("enable", ["httpd:2.4"])
+
+        repos.append(("repo2", [make_module("httpd", "2.4", 3, {"core": "1"})]))
+        ret = self.make_resolver(repos).resolve("enable", ["httpd:2.4"])
+        self.assertIn(("httpd", "2.4", "3"), keys(ret.to_enable))
+
+
+class PrepareModulesTest(ResolverTestCase):
+
+    def setUp(self):
+        ResolverTestCase.setUp(self)
+        self.resolver = self.make_resolver([("repo1", [
+            make_module("core", "1", 1, rpms=["bash"]),
+            make_module("httpd", "2.2", 1, {"core": "1"}, rpms=["httpd"]),
+            make_module("httpd", "2.4", 1, {"core": "1"}, rpms=["httpd"]),
+            make_module("httpd", "2.4", 2, {"core": "1"}, rpms=["httpd", "mod_ssl"]),
+        ])])
+        self.mods = self.resolver.mods
+
+    def get_module(self, name, stream, version):
+        return [mod for mod in self.mods[name]
+                if (mod.mmd.stream, mod.mmd.version) == (stream, version)][0]
+
+    def test_get_module(self):
+        mod = self.resolver._get_module(make_module("httpd", "2.4", 1))
+        self.assertIs(mod, self.get_module("httpd", "2.4", 1))
+        self.assertIsNone(self.resolver._get_module(make_module("httpd", "2.4", 3)))
+
+    def test_prepare_modules(self):
+        prepared = self.resolver._prepare_modules(
+            [make_module("core", "1", 1), make_module("httpd", "2.4", 2)], True)
+        self.assertEqual(prepared, [self.get_module("core", "1", 1),
+                                    self.get_module("httpd", "2.4", 2)])
+        self.assertTrue(self.get_module("httpd", "2.4", 2).repo_file.created)
+
+    def test_prepare_modules_failure(self):
+        self.get_module("httpd", "2.4", 2).error = fm.exceptions.Error("failed")
+        self.assertRaises(fm.exceptions.Error, self.resolver._prepare_modules,
+                          [make_module("core", "1", 1), make_module("httpd", "2.4", 2)],
+                          True)
+        self.assertFalse(self.get_module("core", "1", 1).repo_file.created)
+
+    def test_prepare_unknown_module(self):
+        self.assertRaises(fm.exceptions.DependencyError, self.resolver._prepare_modules,
+                          [make_module("httpd", "2.4", 3)], True)
+
+    def test_install_profile_rpms(self):
+        self.resolver._install_profile_rpms(
+            [make_module("core", "1", 1), make_module("httpd", "2.4", 2)], ["default"])
+        self.assertEqual(self.get_module("core", "1", 1).installed, [["bash"]])
+        self.assertEqual(self.get_module("httpd", "2.4", 2).installed,
+                         [["httpd", "mod_ssl"]])
+        self.assertEqual(self.get_module("httpd", "2.4", 1).installed, [])
+
+
+class DNFBase(object):
+
+    class DNFBASE(object):
+        pluginbase = None
+
+        class dnfbase(object):
+            sack = None
+
+
+class ApplyResultTest(ResolverTestCase):
+
+    def setUp(self):
+        ResolverTestCase.setUp(self)
+        modules = [
+            make_module("core", "1", 1, rpms=["bash"]),
+            make_module("httpd", "2.4", 1, {"core": "1"}, rpms=["httpd"]),
+            make_module("httpd", "2.4", 2, {"core": "1"}, rpms=["httpd", "mod_ssl"]),
+            make_module("tools", "1", 1, {"core": "1"}, rpms=["tools"]),
+        ]
+        for mmd in modules[:2]:
+            mmd.enabled = True
+        self.resolver = self.make_resolver([("repo1", modules)])
+        self.resolver.action = "upgrade"
+        self.mods = self.resolver.mods
+        for mmd in modules[:2]:
+            self.mods[mmd.name][0].repo_file.create()
+
+        self.ret = ModulesResolverResult([], [])
+        self.ret.to_enable = [modules[3]]
+        self.ret.to_upgrade = [(modules[1], modules[2])]
+
+        self.marked = []
+        install_profile_rpms = self.resolver._install_profile_rpms
+
+        def mark(modules, profiles):
+            self.marked.append([mmd.get_nvr() for mmd in modules])
+            install_profile_rpms(modules, profiles)
+        self.resolver._install_profile_rpms = mark
+        fm.api_clients = DNFBase()
+
+    def tearDown(self):
+        del fm.api_clients
+        ResolverTestCase.tearDown(self)
+
+    def get_module(self, name, version):
+        return [mod for mod in self.mods[name] if mod.mmd.version == version][0]
+
+    def test_upgrade_marked_with_enabled(self):
+        self.resolver._apply_result(self.ret)
+        self.assertEqual(self.marked, [["tools-1", "httpd-2"]])
+        self.assertEqual(self.get_module("httpd", 2).installed, [["httpd", "mod_ssl"]])
+        self.assertEqual(self.get_module("tools", 1).installed, [["tools"]])
+        self.assertEqual(self.get_module("httpd", 1).installed, [])
+
+        self.assertEqual(self.get_module("httpd", 2).enabled, [True])
+        self.assertTrue(self.get_module("httpd", 2).upgraded)
+        self.assertTrue(self.get_module("httpd", 2).repo_file.created)
+        self.assertEqual(self.mods.enabled_cache.removed, ["httpd-1"])
+        self.assertEqual(sorted(self.mods.enabled_cache.stored), ["httpd-2", "tools-1"])
+
+    def test_failure_restores_upgraded_repo_file(self):
+        self.get_module("tools", 1).error = fm.exceptions.Error("failed")
+        self.assertRaises(fm.exceptions.Error, self.resolver._apply_result, self.ret)
+        self.assertEqual(self.marked, [])
+        self.assertTrue(self.get_module("httpd", 1).repo_file.created)
+        self.assertFalse(self.get_module("tools", 1).repo_file.created)
+        self.assertEqual(self.mods.enabled_cache.stored, [])
+        self.assertFalse(self.get_module("httpd", 2).upgraded)
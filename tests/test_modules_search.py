@@ -0,0 +1,228 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+import itertools
+import unittest
+
+# fm.modules imports fm.modules_search, so it has to be imported first.
+import fm.modules
+import fm.modules_search
+from fm.metadata import ModuleMetadata
+from fm.modules_index import ModulesIndex
+from fm.modules_rpm_index import RPMIndex
+from fm.modules_search import ModulesSearch
+from fm.modules_text_index import TextIndex, build_text_index
+
+
+def make_module(name, stream, version, summary, description="",
+                licenses=("MIT",), requires=None, rpms=()):
+    mmd = ModuleMetadata(None)
+    mmd.load({
+        "document": "modulemd",
+        "version": 1,
+        "data": {
+            "name": name,
+            "stream": stream,
+            "version": version,
+            "summary": summary,
+            "description": description,
+            "license": {"module": list(licenses)},
+            "dependencies": {"requires": requires or {}},
+            "profiles": {"default": {"rpms": list(rpms)}},
+        },
+    })
+    return mmd
+
+
+def make_modules():
+    return [
+        make_module("core", "1.0", 1, "Core module", "Basic system.",
+                    rpms=["bash", "glibc"]),
+        make_module("apr", "0.1", 1, "APR libraries module",
+                    "Apache portable runtime.", requires={"core": "1.0"},
+                    rpms=["apr"]),
+        make_module("httpd", "2.2", 1, "Apache httpd webserver module",
+                    "The old Apache web server.", licenses=("ASL 2.0",),
+                    requires={"apr": "0.1", "core": "1.0"}, rpms=["httpd"]),
+        make_module("httpd", "2.4", 2, "Apache httpd webserver module",
+                    "The Apache web server.", licenses=("ASL 2.0",),
+                    requires={"apr": "0.1", "core": "1.0"}, rpms=["httpd"]),
+        make_module("httpd", "2.10", 3, "Apache httpd webserver module",
+                    "The newest Apache web server.", licenses=("ASL 2.0",),
+                    requires={"apr": "1", "core": "1.0"}, rpms=["httpd"]),
+        make_module("php", "7", 1, "PHP module", "PHP scripting language.",
+                    licenses=("PHP",), requires={"apr": "1:1"}, rpms=["php"]),
+    ]
+
+
+class Catalog(object):
+
+    def __init__(self, modules):
+        self.index = ModulesIndex(modules)
+
+
+class Modules(object):
+
+    def __init__(self, modules):
+        self.catalog = Catalog(modules)
+
+
+class ModulesIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ModulesIndex(make_modules())
+
+    def names(self, ids):
+        return [(mmd.name, mmd.stream) for mmd in self.index.get_modules(ids)]
+
+    def test_lookup_name(self):
+        self.assertEqual(self.index.lookup("name", "httpd"), set([2, 3, 4]))
+        self.assertEqual(self.index.lookup("name", "unknown"), set())
+
+    def test_match_all_summary(self):
+        ids = self.index.match_all("summary", ["Apache", "webserver"])
+        self.assertEqual(ids, set([2, 3, 4]))
+
+    def test_match_any_license(self):
+        ids = self.index.match_any("license", ["mit"])
+        self.assertEqual(self.names(ids), [("core", "1.0"), ("apr", "0.1")])
+
+    def test_match_inequality_numeric_order(self):
+        ids = self.index.match_inequality("stream", ">", "2.4", ["httpd"])
+        self.assertEqual(self.names(ids), [("httpd", "2.10")])
+
+    def test_match_inequality_candidates(self):
+        ids = self.index.match_inequality("stream", "<", "2.10", None, set([0, 2, 4]))
+        self.assertEqual(self.names(ids), [("core", "1.0"), ("httpd", "2.2")])
+
+    def test_get_dependents(self):
+        self.assertEqual(self.index.get_dependents("apr"), set([2, 3, 4, 5]))
+        self.assertEqual(self.index.get_dependents("apr", "0.1"), set([2, 3]))
+        self.assertEqual(self.index.get_dependents("apr", "1"), set([4, 5]))
+        self.assertEqual(self.index.get_dependents("httpd"), set())
+
+    def test_get_transitive_dependents(self):
+        depths = self.index.get_transitive_dependents("core", "1.0")
+        self.assertEqual(depths, {1: 1, 2: 1, 3: 1, 4: 1})
+
+        depths = self.index.get_transitive_dependents("apr", "0.1")
+        self.assertEqual(depths, {2: 1, 3: 1})
+
+    def test_get_fuzzy_matches(self):
+        matches = self.index.get_fuzzy_matches("htpd")
+        self.assertEqual(matches[0][1], "httpd")
+
+
+class ModulesSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.search = ModulesSearch(Modules(make_modules()))
+
+    def find(self, keywords):
+        return [(mmd.name, mmd.stream) for mmd in self.search.iter_search(keywords)]
+
+    def test_search_name(self):
+        self.assertEqual(self.find({"_name": ["apr"]}), [("apr", "0.1")])
+        self.assertEqual(self.find({"_name": ["unknown"]}), [])
+
+    def test_search_wildcard_name(self):
+        self.assertEqual(self.find({"_name": ["*ttpd"]}),
+                         [("httpd", "2.2"), ("httpd", "2.4"), ("httpd", "2.10")])
+
+    def test_search_name_and_license(self):
+        self.assertEqual(self.find({"_name": ["apr", "httpd"], "_license": ["MIT"]}),
+                         [("apr", "0.1")])
+
+    def test_search_summary(self):
+        found = self.find({"_summary": ["apache webserver"]})
+        self.assertEqual(set(name for name, _ in found), set(["httpd"]))
+
+    def test_search_requires(self):
+        self.assertEqual(self.find({"_requires": {"apr": "1"}}),
+                         [("httpd", "2.10"), ("php", "7")])
+        self.assertEqual(self.find({"_requires": {"apr": "1:1"}}), [("php", "7")])
+        self.assertEqual(len(self.find({"_requires": {"core": ""}})), 4)
+
+    def test_search_release_numeric_order(self):
+        found = self.find({"_name": ["httpd"], "_release": [">", "2.4"]})
+        self.assertEqual(found, [("httpd", "2.10")])
+
+    def test_search_release_wildcard(self):
+        found = self.find({"_name": ["httpd"], "_release": ["==", "2.1*"]})
+        self.assertEqual(found, [("httpd", "2.10")])
+
+    def test_search_no_keywords(self):
+        self.assertEqual(self.find({}), [])
+
+    def test_search_limit(self):
+        found = list(itertools.islice(self.search.iter_search({"_name": ["*"]}), 2))
+        self.assertEqual([(mmd.name, mmd.stream) for mmd in found],
+                         [("core", "1.0"), ("apr", "0.1")])
+
+    def test_search_checks_candidates_lazily(self):
+        matching = self.search.iter_search({"_name": ["*"], "_license": ["MIT"]})
+        self.assertEqual(next(matching).name, "core")
+        first, name = self.search.last_plan
+        self.assertEqual(first.count, 2)
+        self.assertEqual(name.count, 1)
+
+    def test_search_compiles_names_once(self):
+        queries = []
+        orig = fm.modules_search.NameQuery
+
+        class NameQuery(orig):
+            def __init__(self, patterns):
+                queries.append(patterns)
+                orig.__init__(self, patterns)
+
+        fm.modules_search.NameQuery = NameQuery
+        try:
+            found = self.find({"_name": ["httpd"], "_release": [">", "2.2"],
+                               "_version": [">=", "2"]})
+        finally:
+            fm.modules_search.NameQuery = orig
+        self.assertEqual(found, [("httpd", "2.4"), ("httpd", "2.10")])
+        self.assertEqual(queries, [["httpd"]])
+
+    def test_plan_most_selective_first(self):
+        steps = self.search.plan({"_license": ["ASL 2.0"], "_name": ["apr"]})
+        self.assertEqual([step.desc for step in steps],
+                         ["name ['apr']", "license ['ASL 2.0']"])
+
+
+class RPMIndexTest(unittest.TestCase):
+
+    def test_lookup(self):
+        index = RPMIndex.from_modules(make_modules())
+        self.assertEqual(index.lookup("bash"), [("core", "1.0", 1, "profile:default")])
+        self.assertEqual(index.lookup("unknown"), [])
+
+    def test_merge(self):
+        modules = make_modules()
+        index = RPMIndex.merge([RPMIndex.from_modules(modules[:2]).rpms,
+                                RPMIndex.from_modules(modules[2:]).rpms])
+        self.assertEqual(len(index.lookup("httpd")), 3)
+        self.assertEqual(len(index.lookup("apr")), 1)
+
+
+class TextIndexTest(unittest.TestCase):
+
+    def test_search_ranks_summary_match_first(self):
+        index = TextIndex([build_text_index(make_modules())])
+        results = index.search("apache webserver")
+        self.assertEqual(results[0][1], "httpd")
+        self.assertEqual(index.search("unknown"), [])
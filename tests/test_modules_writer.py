@@ -0,0 +1,100 @@
+# Copyright (C) 2012-2016  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+import json
+import unittest
+
+from fm.metadata import ModuleMetadata
+from fm.modules_writer import COLUMN_PADDING, ModulesWriter, brief_rows
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+def make_module(name, version, summary):
+    mmd = ModuleMetadata(None)
+    mmd.load({
+        "document": "modulemd",
+        "version": 1,
+        "data": {
+            "name": name,
+            "stream": "master",
+            "version": version,
+            "summary": summary,
+            "description": summary,
+            "license": {"module": ["MIT"]},
+        },
+    })
+    return mmd
+
+
+def make_modules():
+    return [
+        make_module("core", 1, "Core module"),
+        make_module("apr", 20170101, "APR libraries module"),
+        make_module("httpd", 2, "Apache httpd webserver module"),
+    ]
+
+
+class BriefRowsTest(unittest.TestCase):
+
+    def test_row_per_module(self):
+        rows = list(brief_rows(make_modules()))
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(rows[0].startswith("core "))
+        self.assertTrue(rows[1].endswith("APR libraries module"))
+
+    def test_column_widths(self):
+        rows = list(brief_rows(make_modules()))
+        name_width = len("httpd") + COLUMN_PADDING
+        version_width = len("20170101") + COLUMN_PADDING
+        self.assertEqual(rows[0], "core".ljust(name_width)
+                         + "1".ljust(version_width) + "Core module")
+        for row in rows:
+            self.assertEqual(row[name_width - 1], " ")
+            self.assertNotEqual(row[name_width], " ")
+            self.assertNotEqual(row[name_width + version_width], " ")
+
+    def test_no_modules(self):
+        self.assertEqual(list(brief_rows([])), [])
+
+
+class ModulesWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output = StringIO()
+        self.writer = ModulesWriter(self.output)
+
+    def test_write_brief_description(self):
+        count = self.writer.write_brief_description(make_modules())
+        self.assertEqual(count, 3)
+        self.assertEqual(self.output.getvalue().splitlines(),
+                         list(brief_rows(make_modules())))
+
+    def test_write_jsonl_modules(self):
+        count = self.writer.write_jsonl_modules(make_modules())
+        self.assertEqual(count, 3)
+        rows = [json.loads(row) for row in self.output.getvalue().splitlines()]
+        self.assertEqual([row["name"] for row in rows], ["core", "apr", "httpd"])
+        self.assertEqual(rows[1]["summary"], "APR libraries module")
+        self.assertEqual(rows[1]["license"], {"module": ["MIT"]})
+
+    def test_write_jsonl_no_modules(self):
+        self.assertEqual(self.writer.write_jsonl_modules([]), 0)
+        self.assertEqual(self.output.getvalue(), "")